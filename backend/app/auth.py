@@ -1,63 +1,203 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import hashlib
+import hmac
+import secrets
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-import bcrypt
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
-from app.models import User
+from app.database import SessionLocal, get_async_db, get_lazy_db, release_connection
+from app.models import User, UserSession
+from app.services.password_hashing import hash_password, verify_password
+from app.services.password_pool import password_pool
+from app.services.user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 ALGORITHM = "HS256"
+# Версия набора claims в access token (uid, tier, ver)
+TOKEN_CLAIMS_VERSION = 1
 
-def get_password_hash(password: str) -> str:
-    # Bcrypt has a 72-byte limit, truncate if necessary
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        # Truncate to 72 bytes (not characters)
-        password_bytes = password_bytes[:72]
-    # Generate salt and hash password
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password_bytes, salt)
-    # Return as string (bcrypt hash is always $2b$... format)
-    return hashed.decode('utf-8')
-
-def verify_password(plain: str, hashed: str) -> bool:
-    # Apply same truncation logic for verification
-    password_bytes = plain.encode('utf-8')
-    if len(password_bytes) > 72:
-        password_bytes = password_bytes[:72]
-    # Verify password
-    try:
-        return bcrypt.checkpw(password_bytes, hashed.encode('utf-8'))
-    except Exception:
-        return False
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    username: str
+    subscription_type: str
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            subscription_type=user.subscription_type,
+            token_version=user.token_version or 0,
+        )
+
+async def get_password_hash_async(password: str) -> str:
+    return await password_pool.run_async(hash_password, password)
 
-def create_access_token(sub: str, expires_minutes: int) -> str:
-    to_encode = {"sub": sub, "exp": datetime.utcnow() + timedelta(minutes=expires_minutes)}
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await password_pool.run_async(verify_password, plain, hashed)
+
+def create_access_token(user: User, expires_minutes: int) -> str:
+    to_encode = {
+        "sub": user.username,
+        "cv": TOKEN_CLAIMS_VERSION,
+        "uid": user.id,
+        "tier": user.subscription_type,
+        "ver": user.token_version or 0,
+        "exp": datetime.utcnow() + timedelta(minutes=expires_minutes),
+    }
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=ALGORITHM)
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    user = get_user_by_username(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+async def get_user_by_username_async(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    user = await get_user_by_username_async(db, username)
+    if not user or not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
-    cred_exc = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials", headers={"WWW-Authenticate": "Bearer"})
+def _refresh_token_hash(token: str) -> str:
+    return hmac.new(settings.JWT_SECRET.encode("utf-8"), token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def _refresh_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+async def create_refresh_session(db: AsyncSession, user: User) -> str:
+    """Создаёт сессию и возвращает refresh token; в БД хранится только его HMAC."""
+    now = datetime.now(timezone.utc)
+    # Заодно чистим истёкшие сессии пользователя, чтобы таблица оставалась компактной
+    await db.execute(delete(UserSession).where(UserSession.user_id == user.id, UserSession.expires_at <= now))
+    token = secrets.token_urlsafe(32)
+    db.add(UserSession(user_id=user.id, token_hash=_refresh_token_hash(token), expires_at=_refresh_expiry()))
+    await db.commit()
+    return token
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[Tuple[int, str]]:
+    """
+    Atomically swaps a valid refresh token for a new one in a single UPDATE.
+    Returns (user_id, new_token), or None if the token is unknown, already
+    rotated, revoked or expired.
+    """
+    new_token = secrets.token_urlsafe(32)
+    result = await db.execute(
+        update(UserSession)
+        .where(
+            UserSession.token_hash == _refresh_token_hash(token),
+            UserSession.expires_at > datetime.now(timezone.utc),
+        )
+        .values(token_hash=_refresh_token_hash(new_token), expires_at=_refresh_expiry())
+        .returning(UserSession.user_id)
+    )
+    user_id = result.scalar_one_or_none()
+    await db.commit()
+    if user_id is None:
+        return None
+    return user_id, new_token
+
+async def revoke_refresh_token(db: AsyncSession, token: str) -> None:
+    await db.execute(delete(UserSession).where(UserSession.token_hash == _refresh_token_hash(token)))
+    await db.commit()
+
+def revoke_user_tokens(user: User) -> None:
+    """Инвалидирует выданные токены пользователя (например, после смены подписки). Коммит делает вызывающий код."""
+    user.token_version = (user.token_version or 0) + 1
+
+async def revoke_all_sessions(db: AsyncSession, user: User) -> None:
+    """Выход на всех устройствах: отзывает выданные access token'ы и удаляет все refresh-сессии пользователя."""
+    revoke_user_tokens(user)
+    await db.execute(delete(UserSession).where(UserSession.user_id == user.id))
+    await db.commit()
+    # кладём новую версию в кэш, а не просто сбрасываем его: по кэшу get_current_principal отсекает старые claims
+    user_cache.put(user)
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials", headers={"WWW-Authenticate": "Bearer"})
+
+def _decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise cred_exc
     except JWTError:
-        raise cred_exc
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+def _is_stale(payload: dict, user: User) -> bool:
+    # Токены старого формата без "ver" принимаются до истечения срока действия
+    return "ver" in payload and payload["ver"] != (user.token_version or 0)
+
+def get_current_user(db: Session = Depends(get_lazy_db), token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Пользователь из токена, привязанный к lazy-сессии запроса. Соединение
+    возвращается в пул сразу после поиска; роутеры, которым нужна БД, берут
+    ту же сессию через Depends(get_lazy_db).
+    """
+    payload = _decode_token(token)
+    username: str = payload["sub"]
+    cached = user_cache.get(username)
+    if cached is not None:
+        if _is_stale(payload, cached):
+            raise _credentials_exception()
+        # Привязываем копию снимка к сессии без запроса к БД, чтобы роутеры могли её изменять
+        return db.merge(cached, load=False)
     user = get_user_by_username(db, username)
+    release_connection(db)
+    if user is None:
+        raise _credentials_exception()
+    user_cache.put(user)
+    if _is_stale(payload, user):
+        raise _credentials_exception()
+    return user
+
+async def get_current_user_async(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)) -> User:
+    """То же, что get_current_user, для async-роутеров на AsyncSession."""
+    payload = _decode_token(token)
+    username: str = payload["sub"]
+    cached = user_cache.get(username)
+    if cached is not None:
+        if _is_stale(payload, cached):
+            raise _credentials_exception()
+        return await db.merge(cached, load=False)
+    user = await get_user_by_username_async(db, username)
+    if user is None:
+        raise _credentials_exception()
+    user_cache.put(user)
+    if _is_stale(payload, user):
+        raise _credentials_exception()
+    return user
+
+def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Lightweight alternative to get_current_user for endpoints that only need
+    the caller's identity and tier. A cache hit does no DB I/O; on a miss the
+    user is loaded once through a short-lived session, so a token revoked on
+    another worker (token_version bumped in the DB) is rejected here too.
+    A worker that already cached the user notices the revocation after at
+    most USER_CACHE_TTL_SECONDS, same as get_current_user.
+    """
+    payload = _decode_token(token)
+    user = user_cache.get(payload["sub"])
     if user is None:
-        raise cred_exc
-    return user
\ No newline at end of file
+        db = SessionLocal()
+        try:
+            user = get_user_by_username(db, payload["sub"])
+        finally:
+            db.close()
+        if user is None:
+            raise _credentials_exception()
+        user_cache.put(user)
+    if _is_stale(payload, user):
+        raise _credentials_exception()
+    return Principal.from_user(user)
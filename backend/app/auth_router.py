@@ -1,12 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User
-from app.schemas import UserRegister, UserOut, Token
-from app.auth import get_password_hash, authenticate_user, create_access_token
+from app.schemas import UserRegister, UserOut, Token, RefreshRequest
+from app.auth import (
+    get_password_hash_async,
+    authenticate_user,
+    create_access_token,
+    create_refresh_session,
+    rotate_refresh_token,
+    revoke_refresh_token,
+    revoke_all_sessions,
+    get_current_user_async,
+)
 from app.config import settings
 
 router = APIRouter()
@@ -16,33 +26,59 @@ limiter = Limiter(key_func=get_remote_address)
 
 @router.post("/register", response_model=UserOut, status_code=201)
 @limiter.limit("5/minute")
-def register(request: Request, payload: UserRegister, db: Session = Depends(get_db)):
-    if db.query(User).filter((User.username == payload.username) | (User.email == payload.email)).first():
+async def register(request: Request, payload: UserRegister, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.execute(select(User.id).where((User.username == payload.username) | (User.email == payload.email)))
+    if existing.first():
         raise HTTPException(status_code=400, detail="Username or email already exists")
     user = User(
         username=payload.username,
         email=payload.email,
-        hashed_password=get_password_hash(payload.password),
+        hashed_password=await get_password_hash_async(payload.password),
         full_name=payload.full_name,
         subscription_type=payload.subscription_type or "free",
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.post("/login", response_model=Token)
 @limiter.limit("5/minute")
-def login(request: Request, form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form.username, form.password)
+async def login(request: Request, form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form.username, form.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    token = create_access_token(sub=user.username, expires_minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return Token(access_token=token, token_type="bearer")
+    token = create_access_token(user, expires_minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_token = await create_refresh_session(db, user)
+    return Token(access_token=token, token_type="bearer", refresh_token=refresh_token)
 
+@router.post("/token/refresh", response_model=Token)
+@limiter.limit("30/minute")
+async def refresh_access_token(request: Request, payload: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Выдать новый access token по refresh token без проверки пароля"""
+    rotated = await rotate_refresh_token(db, payload.refresh_token)
+    user = await db.get(User, rotated[0]) if rotated else None
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    token = create_access_token(user, expires_minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return Token(access_token=token, token_type="bearer", refresh_token=rotated[1])
 
+@router.post("/logout", status_code=204)
+async def logout(payload: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Отозвать refresh token (завершить сессию)"""
+    await revoke_refresh_token(db, payload.refresh_token)
+    return None
 
+@router.post("/logout/all", status_code=204)
+async def logout_all(current_user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    """Завершить все сессии пользователя: refresh token'ы удаляются, выданные access token'ы перестают приниматься"""
+    await revoke_all_sessions(db, current_user)
+    return None
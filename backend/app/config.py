@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, field_validator
-from typing import List
+from typing import List, Literal, Optional
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -10,9 +10,54 @@ class Settings(BaseSettings):
     )
     # Required settings - no defaults for security
     DATABASE_URL: str = Field(..., description="PostgreSQL database URL")
+    # Optional streaming replica for read-only endpoints (gets its own async pool of the same size)
+    DATABASE_REPLICA_URL: Optional[str] = None
+    # After a successful write, the same client reads from the primary for this long (read-your-writes)
+    REPLICA_STICKY_SECONDS: float = 5.0
+    # Connection pool, per engine and per worker process (sync and async engines each get one):
+    # workers * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) must stay below Postgres max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 = без ограничения
+    # always: ping on every checkout; idle: only after DB_PRE_PING_IDLE_SECONDS in the pool; never
+    DB_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DB_PRE_PING_IDLE_SECONDS: float = 30.0
+    # Schema handling on worker boot: verify = compare alembic_version with the migration head,
+    # create_all = old behaviour (local development), skip = do nothing
+    DB_SCHEMA_MODE: Literal["verify", "create_all", "skip"] = "verify"
     JWT_SECRET: str = Field(..., min_length=32, description="JWT secret key (minimum 32 characters)")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
     EMAIL_ENABLED: bool = False
+    # Per-worker cache of authenticated users (0 disables the cache)
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    # JSON file with the progressive tax scale per year (default: app/data/tax_rules.json)
+    TAX_RULES_FILE: Optional[str] = None
+    # Year used when SalaryRequest.tax_year is not set (default: the latest year in the file)
+    TAX_DEFAULT_YEAR: Optional[int] = None
+    # Per-worker LRU of serialized /api/salary responses (0 disables the cache)
+    SALARY_CACHE_SIZE: int = 4096
+    # Per-worker LRU of projections by starting conditions, so event edits recompute only later months
+    SALARY_PROJECTION_CACHE_SIZE: int = 256
+    # bcrypt process pool: worker processes (0 = inline) and max queued + running calls
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_PENDING: int = 8
+    # How often each worker re-reads subscription_types (0 = load once on startup)
+    ENTITLEMENTS_REFRESH_SECONDS: float = 30.0
+    # zlib level for history query/response payloads (0 = store new rows uncompressed)
+    HISTORY_COMPRESSION_LEVEL: int = 6
+    # POST /api/history: sync = insert + commit before responding; behind = acknowledge with 202 and
+    # write from a per-worker buffer in batches (entries still buffered are lost if the worker crashes)
+    HISTORY_WRITE_MODE: Literal["sync", "behind"] = "sync"
+    HISTORY_FLUSH_INTERVAL_MS: int = 200
+    HISTORY_FLUSH_BATCH: int = 100
+    # Buffer size per worker; when full, saves fall back to a synchronous write
+    HISTORY_QUEUE_MAX: int = 2000
+    # Comma-separated subscription tiers that always get synchronous history writes
+    HISTORY_SYNC_TIERS: str = ""
     # CORS origins - comma-separated string from env, or default list
     CORS_ORIGINS: str = "https://hirewow.tech,https://www.hirewow.tech,http://localhost:80,http://localhost"
     
@@ -30,4 +75,8 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
         return self.CORS_ORIGINS if isinstance(self.CORS_ORIGINS, list) else []
 
+    @property
+    def history_sync_tiers(self) -> List[str]:
+        return [tier.strip() for tier in self.HISTORY_SYNC_TIERS.split(",") if tier.strip()]
+
 settings = Settings()
\ No newline at end of file
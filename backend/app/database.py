@@ -1,14 +1,115 @@
+import math
+import time
+
+from fastapi import Request, Response
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.config import settings
+from app.db_pool import engine_options, install_idle_pre_ping
+
+# Async-драйверы для тех же баз, что и в DATABASE_URL
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str):
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername))
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+_sync_url = make_url(settings.DATABASE_URL)
+engine = create_engine(_sync_url, **engine_options(_sync_url))
+install_idle_pre_ping(engine)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+# expire_on_commit=False: после commit() загруженные объекты остаются пригодными без повторного чтения
+LazySessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 Base = declarative_base()
 
+_async_url = async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **engine_options(_async_url, is_async=True))
+install_idle_pre_ping(async_engine.sync_engine)
+# expire_on_commit=False: после commit атрибуты не перечитываются неявно (в async это был бы скрытый I/O)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+# Реплика для читающих эндпоинтов; без DATABASE_REPLICA_URL они читают из основной БД
+if settings.DATABASE_REPLICA_URL:
+    _replica_url = async_database_url(settings.DATABASE_REPLICA_URL)
+    async_replica_engine = create_async_engine(_replica_url, **engine_options(_replica_url, is_async=True))
+    install_idle_pre_ping(async_replica_engine.sync_engine)
+    AsyncReplicaSessionLocal = async_sessionmaker(bind=async_replica_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_replica_engine = None
+    AsyncReplicaSessionLocal = AsyncSessionLocal
+
+# Cookie с моментом, до которого клиент читает из основной БД после своей записи.
+# Cookie, а не память воркера: следующий запрос может попасть в другой воркер.
+RECENT_WRITE_COOKIE = "hw_recent_write"
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_lazy_db():
+    """
+    Session for endpoints that touch the DB only briefly (e.g. the auth lookup)
+    and then spend a long time elsewhere (LLM calls, CPU work).
+
+    A Session checks out a connection on its first query, not when it is
+    created, so a request that never queries holds no connection. Ending the
+    transaction with release_connection() returns the connection to the pool
+    while the loaded objects stay usable; the next query checks out a new one.
+    """
+    db = LazySessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def release_connection(db: Session) -> None:
+    """Завершает текущую транзакцию lazy-сессии и возвращает соединение в пул."""
+    if db.in_transaction():
+        db.commit()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def mark_recent_write(response: Response) -> None:
+    sticky = settings.REPLICA_STICKY_SECONDS
+    response.set_cookie(
+        RECENT_WRITE_COOKIE,
+        f"{time.time() + sticky:.3f}",
+        max_age=max(math.ceil(sticky), 1),
+        httponly=True,
+        samesite="lax",
+    )
+
+def recent_write(response: Response) -> None:
+    """
+    Зависимость для эндпоинтов, которые пишут в основную БД: ближайшие чтения
+    клиента идут мимо отстающей реплики. Ответы с ошибкой (HTTPException)
+    собираются заново и cookie не несут.
+    """
+    if async_replica_engine is not None:
+        mark_recent_write(response)
+
+def read_session_factory(request: Request) -> async_sessionmaker:
+    """Реплика, если она настроена и клиент не писал в последние REPLICA_STICKY_SECONDS."""
+    if async_replica_engine is None:
+        return AsyncSessionLocal
+    try:
+        if float(request.cookies.get(RECENT_WRITE_COOKIE, "0")) > time.time():
+            return AsyncSessionLocal
+    except ValueError:
+        pass
+    return AsyncReplicaSessionLocal
+
+async def get_read_db(request: Request):
+    """Сессия для эндпоинтов, которые только читают (реплика с read-your-writes)."""
+    async with read_session_factory(request)() as db:
+        yield db
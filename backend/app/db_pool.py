@@ -0,0 +1,140 @@
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import URL
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from app.config import settings
+
+
+class PoolStats:
+    """Счётчики ожидания соединения из пула (одни на engine)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.pings = 0
+        self.ping_failures = 0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def record_ping(self, ok: bool) -> None:
+        with self._lock:
+            self.pings += 1
+            if not ok:
+                self.ping_failures += 1
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "checkout_wait_seconds_max": self.wait_seconds_max,
+                "pre_pings": self.pings,
+                "pre_ping_failures": self.ping_failures,
+            }
+
+
+def _timed_pool_class(base: Type[Pool], stats: PoolStats) -> Type[Pool]:
+    # Pool.recreate() создаёт пул через self.__class__, поэтому статистика переживает пересоздание
+    class TimedPool(base):
+        pool_stats = stats
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except exc.TimeoutError:
+                self.pool_stats.record_timeout()
+                raise
+            self.pool_stats.record_wait(time.perf_counter() - started)
+            return connection
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _statement_timeout_connect_args(url: URL) -> Dict[str, Any]:
+    timeout_ms = settings.DB_STATEMENT_TIMEOUT_MS
+    if timeout_ms <= 0 or url.get_backend_name() != "postgresql":
+        return {}
+    if url.get_driver_name() == "asyncpg":
+        return {"server_settings": {"statement_timeout": str(timeout_ms)}}
+    # psycopg2: параметр сессии передаётся при подключении, чтобы его не откатил rollback при checkin
+    return {"options": f"-c statement_timeout={timeout_ms}"}
+
+
+def engine_options(url: URL, is_async: bool = False) -> Dict[str, Any]:
+    """Keyword arguments for create_engine/create_async_engine built from the DB_* settings."""
+    stats = PoolStats()
+    base = AsyncAdaptedQueuePool if is_async else QueuePool
+    return {
+        "poolclass": _timed_pool_class(base, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_pre_ping": settings.DB_PRE_PING == "always",
+        "connect_args": _statement_timeout_connect_args(url),
+    }
+
+
+def install_idle_pre_ping(sync_engine) -> None:
+    """
+    DB_PRE_PING=idle: ping a connection on checkout only if it sat in the pool
+    longer than DB_PRE_PING_IDLE_SECONDS, instead of an extra round trip on
+    every checkout.
+    """
+    if settings.DB_PRE_PING != "idle":
+        return
+    stats: PoolStats = sync_engine.pool.pool_stats
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < settings.DB_PRE_PING_IDLE_SECONDS:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception:
+            stats.record_ping(False)
+            # пул выбросит это соединение и попробует открыть новое
+            raise exc.DisconnectionError()
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        stats.record_ping(True)
+
+
+def pool_status(sync_engine) -> Dict[str, Any]:
+    pool = sync_engine.pool
+    status = {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+    status.update(pool.pool_stats.as_dict())
+    return status
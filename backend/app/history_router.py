@@ -1,94 +1,193 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Literal, Optional, Union
+from datetime import date, datetime, time, timedelta, timezone
+import csv
+import io
+import json
 import logging
-from app.database import get_db
-from app.models import User, UserHistory, SubscriptionType
-from app.schemas import HistoryItem, HistoryCreate
-from app.auth import get_current_user
+from app.database import get_async_db, get_read_db, read_session_factory, recent_write
+from app.models import User, UserHistory
+from app.schemas import HistoryAccepted, HistoryItem, HistoryCreate, HistoryBatchCreate, HistoryPage, HistorySearchHit, HistorySummary
+from app.auth import get_current_user_async
+from app.config import settings
+from app.services.entitlements import entitlements
+from app.services.history_queue import history_queue
+from app.services.history_search import search_history
+from app.services.history_store import (
+    before_cursor,
+    decode_cursor,
+    encode_cursor,
+    insert_many_with_retention,
+    insert_with_retention,
+    stream_history,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/history", response_model=HistoryItem, status_code=201)
-def create_history(
+# Верхняя граница размера страницы для списков истории
+MAX_PAGE_SIZE = 200
+
+EXPORT_COLUMNS = ("id", "module_name", "timestamp", "query", "response")
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+def _export_record(row) -> tuple:
+    timestamp = row.timestamp.isoformat() if hasattr(row.timestamp, 'isoformat') else str(row.timestamp)
+    return (row.id, row.module_name, timestamp, row.query, row.response)
+
+async def _ndjson_chunks(chunks: AsyncIterator) -> AsyncIterator[str]:
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, _export_record(row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+async def _csv_chunks(chunks: AsyncIterator) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in chunks:
+        writer.writerows(_export_record(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # пустая выгрузка: отдаём хотя бы заголовок
+        yield buffer.getvalue()
+
+def _history_item(history_item: UserHistory) -> dict:
+    # Преобразуем timestamp в строку
+    timestamp_str = history_item.timestamp.isoformat() if hasattr(history_item.timestamp, 'isoformat') else str(history_item.timestamp)
+    return {
+        "id": history_item.id,
+        "module_name": history_item.module_name,
+        "query": history_item.query,
+        "response": history_item.response,
+        "timestamp": timestamp_str
+    }
+
+
+@router.post(
+    "/history",
+    response_model=Union[HistoryItem, HistoryAccepted],
+    status_code=201,
+    dependencies=[Depends(recent_write)],
+    responses={202: {"model": HistoryAccepted, "description": "Принято в буфер (HISTORY_WRITE_MODE=behind)"}},
+)
+async def create_history(
     history_data: HistoryCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Создать запись в истории пользователя"""
-    # Проверка лимита истории для подписки
-    subscription = db.query(SubscriptionType).filter(
-        SubscriptionType.name == current_user.subscription_type
-    ).first()
-    
-    # Если подписка не найдена, используем дефолтный лимит
-    max_entries = subscription.max_history_entries if subscription else 20
-    
-    # Подсчет текущих записей для модуля
-    module_count = db.query(UserHistory).filter(
-        UserHistory.user_id == current_user.id,
-        UserHistory.module_name == history_data.module_name
-    ).count()
-    
-    # Если превышен лимит, удаляем старые записи
-    if module_count >= max_entries:
-        oldest_entries = db.query(UserHistory).filter(
-            UserHistory.user_id == current_user.id,
-            UserHistory.module_name == history_data.module_name
-        ).order_by(UserHistory.timestamp.asc()).limit(module_count - max_entries + 1).all()
-        
-        for entry in oldest_entries:
-            db.delete(entry)
+    tier = entitlements.tier(current_user.subscription_type)
+    if history_queue.running and tier.name not in settings.history_sync_tiers:
+        entry = history_queue.offer(
+            user_id=current_user.id,
+            max_entries=tier.max_history_entries,
+            module_name=history_data.module_name,
+            query=history_data.query,
+            response=history_data.response,
+        )
+        if entry is not None:
+            response.status_code = status.HTTP_202_ACCEPTED
+            return {
+                "module_name": entry.module_name,
+                "timestamp": entry.accepted_at.isoformat(),
+                "client_id": entry.client_id,
+                "status": "queued",
+            }
+        # буфер заполнен — пишем синхронно, это и есть backpressure
     
-    # Создаем новую запись
+    # Вставка и очистка старых записей сверх лимита подписки — одним запросом
     try:
-        history_entry = UserHistory(
+        entry_id, timestamp = await insert_with_retention(
+            db,
             user_id=current_user.id,
+            max_entries=tier.max_history_entries,
             module_name=history_data.module_name,
             query=history_data.query,
-            response=history_data.response
+            response=history_data.response,
         )
-        db.add(history_entry)
-        db.commit()
-        db.refresh(history_entry)
+        await db.commit()
         
         logger.info(f"History entry created for user {current_user.id}, module {history_data.module_name}")
         
         # Преобразуем timestamp в строку для ответа
-        timestamp_str = history_entry.timestamp.isoformat() if hasattr(history_entry.timestamp, 'isoformat') else str(history_entry.timestamp)
+        timestamp_str = timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)
         history_dict = {
-            "id": history_entry.id,
-            "module_name": history_entry.module_name,
-            "query": history_entry.query,
-            "response": history_entry.response,
+            "id": entry_id,
+            "module_name": history_data.module_name,
+            "query": history_data.query,
+            "response": history_data.response,
             "timestamp": timestamp_str
         }
         return history_dict
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating history entry: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to save history: {str(e)}"
         )
 
+@router.post("/history/batch", response_model=List[HistorySummary], status_code=201, dependencies=[Depends(recent_write)])
+async def create_history_batch(
+    batch: HistoryBatchCreate,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Сохранить пачку записей (синхронизация офлайн-расчётов, импорт) одной транзакцией.
+    Записи сверх лимита подписки по модулю не сохраняются; возвращаются сохранённые.
+    """
+    try:
+        rows = await insert_many_with_retention(
+            db,
+            user_id=current_user.id,
+            max_entries=entitlements.tier(current_user.subscription_type).max_history_entries,
+            entries=[(item.module_name, item.query, item.response) for item in batch.items],
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error creating history batch: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save history: {str(e)}"
+        )
+    
+    logger.info(f"History batch created for user {current_user.id}: {len(rows)} of {len(batch.items)} entries")
+    return [
+        {
+            "id": entry_id,
+            "module_name": module_name,
+            "query_preview": preview or "",
+            "timestamp": timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp),
+        }
+        for entry_id, module_name, preview, timestamp in rows
+    ]
+
 @router.get("/history", response_model=List[HistoryItem])
-def get_history(
+async def get_history(
     module_name: Optional[str] = None,
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить историю запросов пользователя"""
-    query = db.query(UserHistory).filter(UserHistory.user_id == current_user.id)
+    query = select(UserHistory).where(UserHistory.user_id == current_user.id)
     
     if module_name:
-        query = query.filter(UserHistory.module_name == module_name)
+        query = query.where(UserHistory.module_name == module_name)
     
-    history = query.order_by(desc(UserHistory.timestamp)).limit(limit).all()
+    history = (await db.execute(
+        query.order_by(desc(UserHistory.timestamp), desc(UserHistory.id)).limit(limit)
+    )).scalars().all()
     # Преобразуем timestamp в строки
     result = []
     for item in history:
@@ -102,45 +201,151 @@ def get_history(
         })
     return result
 
+@router.get("/history/summaries", response_model=HistoryPage)
+async def get_history_summaries(
+    module_name: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Постраничный список истории без query/response; полная запись — GET /history/{history_id}"""
+    query = select(
+        UserHistory.id,
+        UserHistory.module_name,
+        UserHistory.query_preview,
+        UserHistory.timestamp,
+    ).where(UserHistory.user_id == current_user.id)
+    
+    if module_name:
+        query = query.where(UserHistory.module_name == module_name)
+    
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        query = query.where(before_cursor(*position))
+    
+    # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+    rows = (await db.execute(
+        query.order_by(desc(UserHistory.timestamp), desc(UserHistory.id)).limit(limit + 1)
+    )).all()
+    
+    next_cursor = encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
+    items = [
+        {
+            "id": row.id,
+            "module_name": row.module_name,
+            "query_preview": row.query_preview or "",
+            "timestamp": row.timestamp.isoformat() if hasattr(row.timestamp, 'isoformat') else str(row.timestamp),
+        }
+        for row in rows[:limit]
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/history/export")
+async def export_history(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    module_name: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_user_async)
+):
+    """Выгрузить всю историю (NDJSON или CSV) потоком; даты включительно, по UTC"""
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be later than date_to"
+        )
+    since = datetime.combine(date_from, time.min, tzinfo=timezone.utc) if date_from else None
+    until = datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=timezone.utc) if date_to else None
+    
+    chunks = stream_history(
+        current_user.id, module_name=module_name, since=since, until=until,
+        session_factory=read_session_factory(request),
+    )
+    body = _csv_chunks(chunks) if format == "csv" else _ndjson_chunks(chunks)
+    logger.info(f"History export ({format}) started for user {current_user.id}")
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="history.{format}"'}
+    )
+
+@router.get("/history/search", response_model=List[HistorySearchHit])
+async def search_history_entries(
+    q: str = Query(..., min_length=1, max_length=200),
+    module_name: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Полнотекстовый поиск по истории: самые релевантные записи с подсвеченным фрагментом"""
+    return await search_history(db, current_user.id, q, module_name=module_name, limit=limit)
+
 @router.get("/history/{history_id}", response_model=HistoryItem)
-def get_history_item(
+async def get_history_item(
     history_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Получить конкретную запись истории"""
-    history_item = db.query(UserHistory).filter(
-        UserHistory.id == history_id,
-        UserHistory.user_id == current_user.id
-    ).first()
+    history_item = (await db.execute(
+        select(UserHistory).where(
+            UserHistory.id == history_id,
+            UserHistory.user_id == current_user.id
+        )
+    )).scalars().first()
     
     if not history_item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="History item not found"
         )
-    
-    # Преобразуем timestamp в строку
-    timestamp_str = history_item.timestamp.isoformat() if hasattr(history_item.timestamp, 'isoformat') else str(history_item.timestamp)
-    return {
-        "id": history_item.id,
-        "module_name": history_item.module_name,
-        "query": history_item.query,
-        "response": history_item.response,
-        "timestamp": timestamp_str
-    }
+    return _history_item(history_item)
 
-@router.delete("/history/{history_id}", status_code=204)
-def delete_history_item(
+@router.get("/history/client/{client_id}", response_model=HistoryItem)
+async def get_history_item_by_client_id(
+    client_id: str,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Найти запись по client_id из ответа 202. Читаем с primary: запись из буфера
+    появляется после flush, и реплика может её ещё не видеть. Пока запись в
+    буфере (или если её сразу вытеснил лимит подписки) — 404.
+    """
+    history_item = (await db.execute(
+        select(UserHistory).where(
+            UserHistory.user_id == current_user.id,
+            UserHistory.client_id == client_id
+        )
+    )).scalars().first()
+
+    if not history_item:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="History item not found"
+        )
+    return _history_item(history_item)
+
+@router.delete("/history/{history_id}", status_code=204, dependencies=[Depends(recent_write)])
+async def delete_history_item(
     history_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Удалить запись истории"""
-    history_item = db.query(UserHistory).filter(
-        UserHistory.id == history_id,
-        UserHistory.user_id == current_user.id
-    ).first()
+    history_item = (await db.execute(
+        select(UserHistory).where(
+            UserHistory.id == history_id,
+            UserHistory.user_id == current_user.id
+        )
+    )).scalars().first()
     
     if not history_item:
         raise HTTPException(
@@ -148,23 +353,23 @@ def delete_history_item(
             detail="History item not found"
         )
     
-    db.delete(history_item)
-    db.commit()
+    await db.delete(history_item)
+    await db.commit()
     return None
 
-@router.delete("/history", status_code=204)
-def clear_history(
+@router.delete("/history", status_code=204, dependencies=[Depends(recent_write)])
+async def clear_history(
     module_name: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Очистить историю пользователя (все или для конкретного модуля)"""
-    query = db.query(UserHistory).filter(UserHistory.user_id == current_user.id)
+    query = delete(UserHistory).where(UserHistory.user_id == current_user.id)
     
     if module_name:
-        query = query.filter(UserHistory.module_name == module_name)
+        query = query.where(UserHistory.module_name == module_name)
     
-    query.delete()
-    db.commit()
+    await db.execute(query)
+    await db.commit()
     return None
 
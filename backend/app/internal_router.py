@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from app.database import engine, async_engine, async_replica_engine
+from app.db_pool import pool_status
+from app.services.history_queue import history_queue
+from app.services.password_pool import password_pool
+from app.services.salary_cache import projection_cache, salary_cache
+from app.services.user_cache import user_cache
+
+# Служебные эндпоинты: монтируются без /api, nginx наружу их не проксирует
+router = APIRouter()
+
+@router.get("/internal/metrics")
+def metrics():
+    """Состояние пулов соединений и кэшей текущего воркера"""
+    stats = {
+        "db_pool": pool_status(engine),
+        "async_db_pool": pool_status(async_engine.sync_engine),
+        "user_cache": user_cache.stats(),
+        "salary_cache": salary_cache.stats(),
+        "projection_cache": projection_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "history_queue": history_queue.stats(),
+    }
+    if async_replica_engine is not None:
+        stats["async_db_replica_pool"] = pool_status(async_replica_engine.sync_engine)
+    return stats
\ No newline at end of file
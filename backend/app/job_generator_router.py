@@ -1,13 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
 from app.models import User
-from app.auth import get_current_user
+from app.auth import Principal, get_current_principal, get_current_user
 from pydantic import BaseModel
 from typing import Optional
+from functools import lru_cache
 import os
 import logging
-from openai import OpenAI
 
 router = APIRouter()
 
@@ -23,9 +21,13 @@ logger = logging.getLogger(__name__)
 # Используется Responses API (новый API, замена AI Assistant API)
 # Документация: https://yandex.cloud/ru/docs/ai-studio/concepts/agents/assistant-responses-migration
 # AI Assistant API будет отключен 26 января 2026 года
+# Клиент создаётся один раз на воркер; SDK openai импортируется только при первом обращении,
+# поэтому инстансы без ключей Yandex его не загружают вовсе
+@lru_cache(maxsize=1)
 def get_yandex_client():
     if not YANDEX_CLOUD_API_KEY or not YANDEX_CLOUD_FOLDER:
         return None
+    from openai import OpenAI
     return OpenAI(
         api_key=YANDEX_CLOUD_API_KEY,
         base_url="https://rest-assistant.api.cloud.yandex.net/v1",
@@ -76,7 +78,7 @@ class JobGeneratorResponse(BaseModel):
 
 
 @router.get("/job_generator/status")
-def check_job_generator_status(current_user: User = Depends(get_current_user)):
+def check_job_generator_status(current_user: Principal = Depends(get_current_principal)):
     """
     Проверка статуса конфигурации генератора вакансий
     """
@@ -96,8 +98,7 @@ def check_job_generator_status(current_user: User = Depends(get_current_user)):
 @router.post("/job_generator", response_model=JobGeneratorResponse)
 def generate_job(
     request: JobGeneratorRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     """
     Генерация вакансии с помощью Yandex GPT API с защитой от промт-инженеринга
@@ -1,3 +1,8 @@
+import time
+
+# Отсчёт времени импорта приложения (роутеры, модели, SDK) для лога старта воркера
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -10,9 +15,14 @@ from app.salary_router import router as salary_router
 from app.job_generator_router import router as job_generator_router
 from app.history_router import router as history_router
 from app.profile_router import router as profile_router
-from app.database import Base, engine  # импортируй Base и engine
+from app.internal_router import router as internal_router
+from app.database import Base, engine, async_engine, async_replica_engine  # импортируй Base и engine
 from app.models import User, UserHistory, SubscriptionType  # Импортируем модели для создания таблиц
 from app.config import settings
+from app.services.entitlements import entitlements
+from app.services.history_queue import history_queue
+from app.services.password_pool import password_pool
+from app.schema_version import expected_revision, verify_schema
 import logging
 
 # Configure logging
@@ -21,6 +31,12 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+logger = logging.getLogger(__name__)
+
+# Вычисляется при импорте: с gunicorn --preload это делается один раз в мастер-процессе
+EXPECTED_SCHEMA_REVISION = expected_revision() if settings.DB_SCHEMA_MODE == "verify" else None
+_import_seconds = time.perf_counter() - _import_started
+
 app = FastAPI(title="HR Platform")
 
 # Initialize rate limiter
@@ -39,8 +55,34 @@ app.add_middleware(
 
 @app.on_event("startup")
 def on_startup():
-    # к этому моменту модели (включая User) уже импортированы через роутеры
-    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    if settings.DB_SCHEMA_MODE == "create_all":
+        # к этому моменту модели (включая User) уже импортированы через роутеры
+        Base.metadata.create_all(bind=engine)
+    elif settings.DB_SCHEMA_MODE == "verify":
+        verify_schema(engine, EXPECTED_SCHEMA_REVISION)
+    logger.info(
+        "Worker started: import %.0f ms, startup %.0f ms (schema mode: %s)",
+        _import_seconds * 1000,
+        (time.perf_counter() - started) * 1000,
+        settings.DB_SCHEMA_MODE,
+    )
+
+@app.on_event("startup")
+async def start_background_tasks():
+    await entitlements.start()
+    if settings.HISTORY_WRITE_MODE == "behind":
+        history_queue.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await entitlements.stop()
+    # до закрытия пула: буфер истории дописывается в БД
+    await history_queue.stop()
+    password_pool.shutdown()
+    await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
 
 @app.get("/health")
 def health_check():
@@ -48,6 +90,7 @@ def health_check():
 
 # Auth endpoints at root level
 app.include_router(auth_router, tags=["auth"])
+app.include_router(internal_router, tags=["internal"])
 
 # API endpoints with /api prefix
 app.include_router(users_router, prefix="/api", tags=["users"])
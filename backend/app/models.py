@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import DDL, Column, Integer, String, Text, DateTime, ForeignKey, Index, JSON, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from app.database import Base
+from app.services.history_codec import CompressedText
 
 class User(Base):
     __tablename__ = "users"
@@ -11,18 +13,58 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     full_name = Column(String, nullable=True)
     subscription_type = Column(String, default="free", nullable=False)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)  # увеличивается при отзыве токенов
 
 class SubscriptionType(Base):
     __tablename__ = "subscription_types"
     id = Column(Integer, primary_key=True)
     name = Column(String, unique=True, nullable=False)      # free, premium, business
     max_history_entries = Column(Integer, nullable=False)   # лимит записей истории на модуль
+    enabled_modules = Column(JSON, nullable=True)           # список доступных модулей; NULL — значение по умолчанию для тарифа
 
 class UserHistory(Base):
     __tablename__ = "user_history"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     module_name = Column(String, nullable=False)
-    query = Column(Text, nullable=False)  # Text для больших JSON строк
-    response = Column(Text, nullable=False)  # Text для больших ответов
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
+    query = Column(CompressedText, nullable=False)  # JSON запроса, хранится сжатым
+    response = Column(CompressedText, nullable=False)  # ответ модуля, хранится сжатым
+    query_preview = Column(String(200), nullable=True)  # начало query для списков, чтобы не читать большие колонки
+    content_hash = Column(String(64), nullable=True)  # sha256 пары query/response для дедупликации повторных сохранений
+    # tsvector для полнотекстового поиска; не загружается вместе с записью. В SQLite колонка пустая,
+    # поиск там идёт по FTS5-таблице user_history_fts
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    client_id = Column(String(32), nullable=True)  # id из ответа 202 для записей, сохранённых через буфер (write-behind)
+
+    __table_args__ = (
+        # Выборка, подсчёт и очистка истории идут по (user_id, module_name) с сортировкой по времени
+        Index("ix_user_history_user_module_ts", "user_id", "module_name", timestamp.desc()),
+        # Лента по всем модулям и её страницы (keyset по (timestamp, id)) — без сортировки в памяти
+        Index("ix_user_history_user_ts", "user_id", timestamp.desc(), id.desc()),
+        # Повторное сохранение той же пары query/response обновляет timestamp существующей записи
+        Index("uq_user_history_content", "user_id", "module_name", "content_hash", unique=True),
+        # Поиск записи из буфера по id, выданному клиенту в ответе 202
+        Index("uq_user_history_client_id", "user_id", "client_id", unique=True),
+        Index("ix_user_history_search", "search_vector", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
+
+# SQLite (локальный запуск): полнотекстовый поиск по истории через FTS5 вместо tsvector.
+# rowid строки FTS = user_history.id; при удалении записи строка индекса удаляется триггером.
+SQLITE_FTS_TABLE = "user_history_fts"
+SQLITE_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} "
+    "USING fts5(query, response, tokenize = 'unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_delete AFTER DELETE ON user_history "
+    f"BEGIN DELETE FROM {SQLITE_FTS_TABLE} WHERE rowid = old.id; END",
+)
+for _statement in SQLITE_FTS_DDL:
+    event.listen(UserHistory.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+class UserSession(Base):
+    __tablename__ = "user_sessions"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(String(64), unique=True, nullable=False)  # HMAC-SHA256 текущего refresh token
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
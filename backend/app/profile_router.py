@@ -1,43 +1,47 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db, recent_write
 from app.models import User
 from app.schemas import UserOut, UserUpdate
-from app.auth import get_current_user
+from app.auth import get_current_user_async
+from app.services.user_cache import user_cache
 
 router = APIRouter()
 
 @router.get("/profile", response_model=UserOut)
-def get_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_profile(
+    current_user: User = Depends(get_current_user_async),
 ):
     """Получить профиль текущего пользователя"""
     return current_user
 
-@router.put("/profile", response_model=UserOut)
-def update_profile(
+@router.put("/profile", response_model=UserOut, dependencies=[Depends(recent_write)])
+async def update_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обновить профиль пользователя"""
     if user_update.full_name is not None:
         current_user.full_name = user_update.full_name
     if user_update.email is not None:
         # Проверка на уникальность email
-        existing_user = db.query(User).filter(
-            User.email == user_update.email,
-            User.id != current_user.id
-        ).first()
-        if existing_user:
+        existing_user = await db.execute(
+            select(User.id).where(
+                User.email == user_update.email,
+                User.id != current_user.id
+            )
+        )
+        if existing_user.first():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already exists"
             )
         current_user.email = user_update.email
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    user_cache.invalidate(current_user.username)
+    await db.refresh(current_user)
     return current_user
 
@@ -1,21 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User
-from app.schemas import SalaryRequest, SalaryResponse, MonthResult, SalarySummary
-from app.auth import get_current_user
-from typing import List, Dict, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, Response
+from app.schemas import (
+    SalaryRequest, SalaryResponse, SalaryBatchRequest, SalaryBatchResponse, SalarySolveRequest, SalarySolveResponse,
+    SalaryRawResponse, SalaryRawBatchResponse, SalaryProjectionRequest, SalaryProjectionResponse, SalaryProjectionYear,
+    MonthResult, SalarySummary,
+)
+from app.auth import Principal, get_current_principal
+from app.services.salary_cache import cache_key, normalize_request, projection_cache, salary_cache
+from app.services.salary_projection import KPI_PAYMENTS, KPI_PERIOD_NAMES, ProjectionBase, SalaryProjection
+from app.services.tax_rules import tax_rules
+from typing import List, Dict, Literal, Optional, Tuple, Union
+from dataclasses import dataclass
+from datetime import date
+import json
+import math
 
 router = APIRouter()
 
-# Годовые пороги для НДФЛ (прогрессивная шкала)
-THRESHOLDS: Dict[float, float] = {
-    2_400_000: 0.13,   # 13% до 2.4 млн
-    5_000_000: 0.15,   # 15% до 5 млн
-    20_000_000: 0.18,  # 18% до 20 млн
-    50_000_000: 0.20,  # 20% до 50 млн
-    float('inf'): 0.22 # 22% свыше 50 млн
-}
+# formatted — суммы строками для показа (по умолчанию), raw — числами, колонками по месяцам
+OutputFormat = Literal["formatted", "raw"]
 
 # Month names in Russian
 MONTH_NAMES = [
@@ -32,7 +35,24 @@ def format_number_decimal(number: float) -> str:
     return "{:,.2f}".format(number).replace(",", " ")
 
 
-def calculate_salary(request: SalaryRequest) -> SalaryResponse:
+@dataclass
+class SalaryBreakdown:
+    """Числовой результат расчёта по месяцам, до форматирования."""
+    tax_year: int
+    gross: List[float]
+    bonus: List[float]
+    kpi_notes: List[str]
+    tax: List[float]
+    net: List[float]
+    cumulative: List[float]
+    tax_parts: List[List[Tuple[str, float]]]  # по месяцам: (ставка, облагаемая сумма)
+    rate_details: List[str]  # по месяцам: в прогнозе РК и СН меняются
+    yearly_gross: float
+    total_tax: float
+    yearly_net: float
+
+
+def compute_salary(request: SalaryRequest) -> SalaryBreakdown:
     """
     Calculate salary breakdown for 12 months with progressive tax system.
     """
@@ -41,6 +61,7 @@ def calculate_salary(request: SalaryRequest) -> SalaryResponse:
     monthly_bonus = request.monthly_bonus or 0.0
     rk_rate = request.rk_rate
     sn_percentage = request.sn_percentage / 100.0
+    schedule = tax_rules.schedule(request.tax_year)
     
     # Base income with regional coefficient
     base_income = (base_salary + monthly_bonus) * rk_rate
@@ -96,43 +117,17 @@ def calculate_salary(request: SalaryRequest) -> SalaryResponse:
         
         cumulative_income += monthly_gross
         monthly_tax = 0.0
-        tax_info_parts = []
-        temp_cumulative = cumulative_income
-        
-        # Progressive tax calculation based on cumulative income
-        prev_threshold = 0.0
-        sorted_thresholds = sorted(THRESHOLDS.items())
-        
-        for threshold, rate in sorted_thresholds:
-            if temp_cumulative > prev_threshold:
-                taxable = min(temp_cumulative, threshold) - prev_threshold
-                if taxable > 0:
-                    if cumulative_income <= threshold:
-                        # Весь месячный доход попадает в этот диапазон
-                        monthly_tax += min(monthly_gross, taxable) * rate
-                        tax_info_parts.append(f"{rate*100:.0f}% на {format_number(min(monthly_gross, taxable))} руб.")
-                    elif cumulative_income - monthly_gross < threshold <= cumulative_income:
-                        # Часть месячного дохода попадает в этот диапазон
-                        base = threshold - (cumulative_income - monthly_gross)
-                        monthly_tax += base * rate
-                        tax_info_parts.append(f"{rate*100:.0f}% на {format_number(base)} руб.")
-                    prev_threshold = threshold
-            else:
-                break
+        tax_parts = []
+
+        # Прогрессивная шкала по доходу нарастающим итогом: только ступени, которые задевает этот месяц
+        for bracket, amount in schedule.month_parts(cumulative_income, monthly_gross):
+            monthly_tax += amount * schedule.rates[bracket]
+            tax_parts.append((schedule.labels[bracket], amount))
         
         total_tax += monthly_tax
         net_income = monthly_gross - monthly_tax
         
-        monthly_data.append({
-            'month': MONTH_NAMES[month_idx],
-            'gross': format_number_decimal(monthly_gross),
-            'tax': format_number_decimal(monthly_tax),
-            'net': format_number_decimal(net_income),
-            'tax_info': " ".join(tax_info_parts),
-            'cumulative': format_number_decimal(cumulative_income),
-            'bonus': format_number_decimal(bonus) if bonus > 0 else "0.00",
-            'kpi_note': kpi_note
-        })
+        monthly_data.append((monthly_gross, bonus, kpi_note, monthly_tax, net_income, cumulative_income, tax_parts))
     
     yearly_net = yearly_gross - total_tax
     
@@ -140,95 +135,363 @@ def calculate_salary(request: SalaryRequest) -> SalaryResponse:
     rate_details = f"РК: {rk_rate:.2f}"
     if sn_percentage > 0:
         rate_details += f", СН: {request.sn_percentage:.1f}%"
-    
-    # Convert to MonthResult format
+
+    gross, bonuses, kpi_notes, taxes, nets, cumulative, tax_parts = (list(column) for column in zip(*monthly_data))
+    return SalaryBreakdown(
+        tax_year=schedule.year,
+        gross=gross,
+        bonus=bonuses,
+        kpi_notes=kpi_notes,
+        tax=taxes,
+        net=nets,
+        cumulative=cumulative,
+        tax_parts=tax_parts,
+        rate_details=[rate_details] * 12,
+        yearly_gross=yearly_gross,
+        total_tax=total_tax,
+        yearly_net=yearly_net,
+    )
+
+
+def calculate_salary(request: SalaryRequest) -> SalaryResponse:
+    """Расчёт с суммами, отформатированными для показа (строки вида "1 234 567.89")."""
+    return format_salary(compute_salary(request))
+
+
+def format_salary(breakdown: SalaryBreakdown) -> SalaryResponse:
     months: List[MonthResult] = []
-    for data in monthly_data:
+    for month_idx in range(12):
+        bonus = breakdown.bonus[month_idx]
         months.append(MonthResult(
-            month=data['month'],
-            income=data['gross'],
-            kpi_bonus=data['bonus'],
-            kpi_note=data['kpi_note'],
-            tax=data['tax'],
-            net_income=data['net'],
-            tax_info=data['tax_info'],
-            rate_details=rate_details,
-            cumulative_income=data['cumulative']
+            month=MONTH_NAMES[month_idx],
+            income=format_number_decimal(breakdown.gross[month_idx]),
+            kpi_bonus=format_number_decimal(bonus) if bonus > 0 else "0.00",
+            kpi_note=breakdown.kpi_notes[month_idx],
+            tax=format_number_decimal(breakdown.tax[month_idx]),
+            net_income=format_number_decimal(breakdown.net[month_idx]),
+            tax_info=" ".join(f"{label}% на {format_number(amount)} руб." for label, amount in breakdown.tax_parts[month_idx]),
+            rate_details=breakdown.rate_details[month_idx],
+            cumulative_income=format_number_decimal(breakdown.cumulative[month_idx])
         ))
 
     summary = SalarySummary(
-        annual_income=format_number_decimal(yearly_gross),
-        annual_tax=format_number_decimal(total_tax),
-        annual_net_income=format_number_decimal(yearly_net)
+        annual_income=format_number_decimal(breakdown.yearly_gross),
+        annual_tax=format_number_decimal(breakdown.total_tax),
+        annual_net_income=format_number_decimal(breakdown.yearly_net)
     )
 
     return SalaryResponse(months=months, summary=summary)
 
-@router.post("/salary", response_model=SalaryResponse)
+
+def _cents(values: List[float]) -> List[float]:
+    return [round(value, 2) for value in values]
+
+
+def raw_salary(breakdown: SalaryBreakdown) -> Dict:
+    """Ответ format=raw: числа, округлённые до копеек, колонками по 12 месяцев."""
+    return {
+        "tax_year": breakdown.tax_year,
+        "income": _cents(breakdown.gross),
+        "kpi_bonus": _cents(breakdown.bonus),
+        "tax": _cents(breakdown.tax),
+        "net_income": _cents(breakdown.net),
+        "cumulative_income": _cents(breakdown.cumulative),
+        "summary": {
+            "annual_income": round(breakdown.yearly_gross, 2),
+            "annual_tax": round(breakdown.total_tax, 2),
+            "annual_net_income": round(breakdown.yearly_net, 2),
+        },
+    }
+
+
+def annual_multiplier(request) -> float:
+    """Во сколько раз годовой доход больше (оклад + ежемесячная премия): РК, СН и KPI."""
+    kpi = request.kpi_percentage / 100.0 if request.kpi_enabled and request.kpi_percentage else 0.0
+    return request.rk_rate * (1 + request.sn_percentage / 100.0) * 12 * (1 + kpi)
+
+
+def solve_salary(request: SalaryRequest, annual_net: float) -> float:
+    """
+    Оклад (с округлением до копейки вверх), при котором чистый доход за год равен
+    annual_net при остальных условиях request (его salary не используется).
+
+    Годовой доход линеен по окладу, а налог — кусочно-линейная функция годового
+    дохода, поэтому оклад находится обращением шкалы (TaxSchedule.gross_for_net)
+    за один bisect, без подбора. request должен пройти normalize_request():
+    по тем же параметрам потом строится разбивка, иначе округление процентов
+    в ней может увести чистый доход ниже цели.
+    """
+    schedule = tax_rules.schedule(request.tax_year)
+    salary = schedule.gross_for_net(annual_net) / annual_multiplier(request) - (request.monthly_bonus or 0.0)
+    # round() срезает шум вроде 12345.000000001, чтобы он не превращался в лишнюю копейку
+    return math.ceil(round(salary * 100, 6)) / 100
+
+
+def validate_salary_request(request: SalaryRequest) -> Optional[str]:
+    """Текст ошибки валидации или None, если запрос корректен."""
+    if request.salary < 0:
+        return "Salary must be non-negative"
+    if request.monthly_bonus is not None and request.monthly_bonus < 0:
+        return "Monthly bonus must be non-negative"
+    if request.rk_rate < 1.0:
+        return "Regional coefficient must be >= 1.0"
+    if not (0 <= request.sn_percentage <= 100):
+        return "Northern allowance percentage must be between 0 and 100"
+    if request.kpi_enabled:
+        if request.kpi_percentage is None:
+            return "KPI percentage is required when KPI is enabled"
+        if not (0 <= request.kpi_percentage <= 100):
+            return "KPI percentage must be between 0 and 100"
+        if request.kpi_period is None:
+            return "KPI period is required when KPI is enabled"
+        if request.kpi_period not in ["quarter", "halfyear"]:
+            return "KPI period must be 'quarter' or 'halfyear'"
+    if request.tax_year is not None and request.tax_year not in tax_rules:
+        return f"Unknown tax year; available: {', '.join(str(year) for year in tax_rules.years)}"
+    return None
+
+def validate_projection_request(request: SalaryProjectionRequest, start_year: int) -> Optional[str]:
+    """Текст ошибки валидации прогноза или None."""
+    error = validate_salary_request(SalaryRequest(**request.model_dump(exclude={"start_year", "years", "events"})))
+    if error:
+        return error
+    for index, event in enumerate(request.events):
+        if not (start_year <= event.year < start_year + request.years):
+            error = "Event is outside the projection horizon"
+        elif event.kind == "salary" and event.value < 0:
+            error = "Salary must be non-negative"
+        elif event.kind in ("raise", "indexation") and event.value <= -100:
+            error = "Raise must be greater than -100%"
+        elif event.kind == "rk" and event.value < 1.0:
+            error = "Regional coefficient must be >= 1.0"
+        elif event.kind == "sn" and not (0 <= event.value <= 100):
+            error = "Northern allowance percentage must be between 0 and 100"
+        elif event.kind == "unpaid_leave" and not (0 < event.value <= 1):
+            error = "Unpaid leave share must be greater than 0 and at most 1"
+        if error:
+            return f"events[{index}]: {error}"
+    return None
+
+
+def projection_breakdowns(projection: SalaryProjection) -> List[SalaryBreakdown]:
+    """Прогноз по календарным годам в том же виде, что и расчёт одного года."""
+    base = projection.base
+    payments = KPI_PAYMENTS[base.kpi_period] if base.kpi_percentage and base.kpi_period else {}
+    kpi_note = f"KPI выплата ({KPI_PERIOD_NAMES.get(base.kpi_period, '')})"
+    breakdowns = []
+    for year_index in range(base.years):
+        states = projection.states[year_index * 12:(year_index + 1) * 12]
+        yearly_gross = 0.0
+        total_tax = 0.0
+        rate_details = []
+        for state in states:
+            yearly_gross += state.gross
+            total_tax += state.tax
+            details = f"РК: {state.rk_rate:.2f}"
+            if state.sn_percentage / 100.0 > 0:
+                details += f", СН: {state.sn_percentage:.1f}%"
+            rate_details.append(details)
+        breakdowns.append(SalaryBreakdown(
+            tax_year=states[0].tax_year,
+            gross=[state.gross for state in states],
+            bonus=[state.bonus for state in states],
+            kpi_notes=[kpi_note if month_idx in payments else "" for month_idx in range(12)],
+            tax=[state.tax for state in states],
+            net=[state.gross - state.tax for state in states],
+            cumulative=[state.cumulative for state in states],
+            tax_parts=[list(state.tax_parts) for state in states],
+            rate_details=rate_details,
+            yearly_gross=yearly_gross,
+            total_tax=total_tax,
+            yearly_net=yearly_gross - total_tax,
+        ))
+    return breakdowns
+
+
+@router.post("/salary", response_model=Union[SalaryResponse, SalaryRawResponse])
 def calculate_salary_endpoint(
     request: SalaryRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    output: OutputFormat = Query("formatted", alias="format"),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Calculate salary breakdown. Requires authentication.
+    format=raw returns numbers instead of display strings (SalaryRawResponse).
     """
-    # Validation
-    if request.salary < 0:
+    error = validate_salary_request(request)
+    if error:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Salary must be non-negative"
+            detail=error
         )
-    
-    if request.monthly_bonus is not None and request.monthly_bonus < 0:
+
+    request = normalize_request(request)
+    key = cache_key(request) + (output,)
+    body = salary_cache.get(key)
+    if body is not None:
+        return Response(content=body, media_type="application/json")
+
+    try:
+        if output == "raw":
+            body = json.dumps(raw_salary(compute_salary(request)), separators=(",", ":")).encode("utf-8")
+        else:
+            body = calculate_salary(request).model_dump_json().encode("utf-8")
+    except Exception as e:
+        # Log the full error server-side
+        import logging
+        logging.error(f"Salary calculation error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error during calculation"
+        )
+    salary_cache.put(key, body)
+    return Response(content=body, media_type="application/json")
+
+@router.post("/salary/batch", response_model=Union[SalaryBatchResponse, SalaryRawBatchResponse])
+def calculate_salary_batch_endpoint(
+    batch: SalaryBatchRequest,
+    output: OutputFormat = Query("formatted", alias="format"),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Расчёт многих сценариев за один запрос (сравнение офферов, сетки зарплат).
+    Результат каждого сценария совпадает с POST /salary.
+    """
+    for index, item in enumerate(batch.items):
+        error = validate_salary_request(item)
+        if error:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"items[{index}]: {error}"
+            )
+
+    # numpy импортируется только здесь, чтобы не замедлять старт воркеров
+    from app.services.salary_batch import calculate_salary_batch
+    try:
+        results = calculate_salary_batch([normalize_request(item) for item in batch.items], raw=output == "raw")
+    except Exception as e:
+        import logging
+        logging.error(f"Salary batch calculation error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error during calculation"
+        )
+    # ответ уже собран из строк нужной формы; повторная валидация тысяч MonthResult заметно дороже самого расчёта
+    return JSONResponse({"results": results})
+
+@router.post("/salary/solve", response_model=SalarySolveResponse)
+def solve_salary_endpoint(
+    request: SalarySolveRequest,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Обратный расчёт: оклад по желаемой сумме на руки, с помесячной разбивкой.
+    """
+    parameters = SalaryRequest(salary=0.0, **request.model_dump(exclude={"target_net", "net_period"}))
+    error = validate_salary_request(parameters)
+    if error:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Monthly bonus must be non-negative"
+            detail=error
         )
-    
-    if request.rk_rate < 1.0:
+
+    # решаем и считаем разбивку по одним и тем же (нормализованным) параметрам
+    parameters = normalize_request(parameters)
+    target = request.target_net * 12 if request.net_period == "month" else request.target_net
+    salary = solve_salary(parameters, target)
+    if salary < 0:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Regional coefficient must be >= 1.0"
+            detail="Target net income is already covered by the monthly bonus"
         )
-    
-    if not (0 <= request.sn_percentage <= 100):
+
+    salary_request = parameters.model_copy(update={"salary": salary})
+    annual_gross = (salary_request.salary + salary_request.monthly_bonus) * annual_multiplier(salary_request)
+    annual_net = annual_gross - tax_rules.schedule(salary_request.tax_year).tax(annual_gross)
+    try:
+        result = calculate_salary(salary_request)
+    except Exception as e:
+        import logging
+        logging.error(f"Salary solve error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error during calculation"
+        )
+    return SalarySolveResponse(
+        salary=salary,
+        annual_gross_income=round(annual_gross, 2),
+        annual_net_income=round(annual_net, 2),
+        result=result,
+    )
+
+@router.post("/salary/projection", response_model=SalaryProjectionResponse)
+def salary_projection_endpoint(
+    request: SalaryProjectionRequest,
+    response: Response,
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Прогноз на несколько лет с событиями (повышение, отпуск без сохранения, переезд, индексация).
+    Последний прогноз с теми же начальными условиями хранится в кэше воркера: при правке
+    событий пересчитываются только месяцы начиная с первого изменённого (X-Recomputed-Months).
+    """
+    start_year = request.start_year or date.today().year
+    error = validate_projection_request(request, start_year)
+    if error:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail="Northern allowance percentage must be between 0 and 100"
+            detail=error
         )
-    
-    if request.kpi_enabled:
-        if request.kpi_percentage is None:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="KPI percentage is required when KPI is enabled"
-            )
-        if not (0 <= request.kpi_percentage <= 100):
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="KPI percentage must be between 0 and 100"
-            )
-        if request.kpi_period is None:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="KPI period is required when KPI is enabled"
-            )
-        if request.kpi_period not in ["quarter", "halfyear"]:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="KPI period must be 'quarter' or 'halfyear'"
-            )
 
+    normalized = normalize_request(SalaryRequest(**request.model_dump(exclude={"start_year", "years", "events"})))
+    base = ProjectionBase(
+        salary=normalized.salary,
+        monthly_bonus=normalized.monthly_bonus,
+        rk_rate=normalized.rk_rate,
+        sn_percentage=normalized.sn_percentage,
+        kpi_percentage=normalized.kpi_percentage or 0.0,
+        kpi_period=normalized.kpi_period,
+        start_year=start_year,
+        years=request.years,
+    )
+    # внутри месяца события применяются в порядке запроса
+    events = sorted(
+        (((event.year - start_year) * 12 + event.month - 1, event.kind, event.value, event.months) for event in request.events),
+        key=lambda event: event[0],
+    )
     try:
-        result = calculate_salary(request)
-        return result
+        cached = projection_cache.get(base)
+        if cached is None:
+            projection, start = SalaryProjection.build(base, events), 0
+        else:
+            projection, start = cached.with_events(events)
+        projection_cache.put(base, projection)
+        breakdowns = projection_breakdowns(projection)
     except Exception as e:
-        # Log the full error server-side
         import logging
-        logging.error(f"Salary calculation error: {str(e)}", exc_info=True)
+        logging.error(f"Salary projection error: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error during calculation"
         )
 
+    response.headers["X-Recomputed-Months"] = str(projection.months - start)
+    total_gross = sum(breakdown.yearly_gross for breakdown in breakdowns)
+    total_tax = sum(breakdown.total_tax for breakdown in breakdowns)
+    years = []
+    for offset, breakdown in enumerate(breakdowns):
+        formatted = format_salary(breakdown)
+        years.append(SalaryProjectionYear(
+            year=start_year + offset,
+            tax_year=breakdown.tax_year,
+            months=formatted.months,
+            summary=formatted.summary,
+        ))
+    return SalaryProjectionResponse(
+        years=years,
+        summary=SalarySummary(
+            annual_income=format_number_decimal(total_gross),
+            annual_tax=format_number_decimal(total_tax),
+            annual_net_income=format_number_decimal(total_gross - total_tax),
+        ),
+    )
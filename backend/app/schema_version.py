@@ -0,0 +1,35 @@
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def expected_revision() -> Optional[str]:
+    """Head-ревизия из backend/migrations (без подключения к БД)."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def verify_schema(engine: Engine, expected: Optional[str]) -> None:
+    """
+    Cheap replacement for create_all on boot: a single read of
+    alembic_version instead of introspecting the catalog. Raises if the
+    database is not at the migration head, so a worker never serves traffic
+    against a schema it does not match.
+    """
+    with engine.connect() as connection:
+        try:
+            current = connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+        except Exception as e:
+            raise RuntimeError("Database is not under Alembic control; run `alembic upgrade head`") from e
+    if current != expected:
+        raise RuntimeError(
+            f"Database schema revision is {current}, application expects {expected}; run `alembic upgrade head`"
+        )
\ No newline at end of file
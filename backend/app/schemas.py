@@ -49,6 +49,10 @@ class UserUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class ModuleInterface(BaseModel):
     name: str
@@ -65,11 +69,38 @@ class HistoryItem(BaseModel):
     class Config:
         from_attributes = True
 
+class HistoryAccepted(BaseModel):
+    module_name: str
+    timestamp: str  # с этим timestamp запись будет сохранена
+    client_id: str  # по нему запись находится после записи: GET /history/client/{client_id}
+    status: Literal["queued"] = "queued"
+
+class HistorySummary(BaseModel):
+    id: int
+    module_name: str
+    query_preview: str
+    timestamp: str
+
+class HistoryPage(BaseModel):
+    items: List[HistorySummary]
+    next_cursor: Optional[str] = None
+
+class HistorySearchHit(BaseModel):
+    id: int
+    module_name: str
+    query_preview: str
+    timestamp: str
+    rank: float
+    snippet: str  # HTML-экранированный фрагмент, совпадения в <b>
+
 class HistoryCreate(BaseModel):
     module_name: str
     query: str
     response: str
 
+class HistoryBatchCreate(BaseModel):
+    items: List[HistoryCreate] = Field(..., min_length=1, max_length=500, description="Записи в хронологическом порядке")
+
 class SalaryRequest(BaseModel):
     salary: float
     monthly_bonus: Optional[float] = None
@@ -78,6 +109,7 @@ class SalaryRequest(BaseModel):
     kpi_enabled: bool
     kpi_percentage: Optional[float] = None
     kpi_period: Optional[Literal["quarter", "halfyear"]] = None
+    tax_year: Optional[int] = None  # год шкалы НДФЛ; по умолчанию — последний из tax_rules.json
 
 class MonthResult(BaseModel):
     month: str
@@ -97,4 +129,77 @@ class SalarySummary(BaseModel):
 
 class SalaryResponse(BaseModel):
     months: List[MonthResult]
-    summary: SalarySummary
\ No newline at end of file
+    summary: SalarySummary
+
+class SalaryBatchRequest(BaseModel):
+    items: List[SalaryRequest] = Field(..., min_length=1, max_length=5000, description="Сценарии расчёта")
+
+class SalaryBatchResponse(BaseModel):
+    results: List[SalaryResponse]
+
+class SalarySolveRequest(BaseModel):
+    target_net: float = Field(..., gt=0, description="Желаемая сумма на руки")
+    net_period: Literal["month", "year"] = "month"  # month — в среднем за месяц, т.е. годовая сумма / 12
+    monthly_bonus: Optional[float] = None
+    rk_rate: float
+    sn_percentage: float
+    kpi_enabled: bool
+    kpi_percentage: Optional[float] = None
+    kpi_period: Optional[Literal["quarter", "halfyear"]] = None
+    tax_year: Optional[int] = None
+
+class SalarySolveResponse(BaseModel):
+    salary: float  # оклад до копеек, при котором выходит target_net
+    annual_gross_income: float
+    annual_net_income: float
+    result: SalaryResponse
+
+class SalaryRawSummary(BaseModel):
+    annual_income: float
+    annual_tax: float
+    annual_net_income: float
+
+class SalaryRawResponse(BaseModel):
+    """format=raw: суммы числами (до копеек), по 12 значений на колонку, январь первым."""
+    tax_year: int
+    income: List[float]
+    kpi_bonus: List[float]
+    tax: List[float]
+    net_income: List[float]
+    cumulative_income: List[float]
+    summary: SalaryRawSummary
+
+class SalaryRawBatchResponse(BaseModel):
+    results: List[SalaryRawResponse]
+
+class ProjectionEvent(BaseModel):
+    year: int  # календарный год
+    month: int = Field(..., ge=1, le=12)
+    # salary — новый оклад; raise — повышение на value %; indexation — value % сейчас и каждые 12 месяцев;
+    # rk — новый районный коэффициент; sn — новый % северной надбавки;
+    # unpaid_leave — доля неоплаченных дней (0..1] в течение months месяцев
+    kind: Literal["salary", "raise", "indexation", "rk", "sn", "unpaid_leave"]
+    value: float
+    months: int = Field(1, ge=1, le=12, description="Длительность, только для unpaid_leave")
+
+class SalaryProjectionRequest(BaseModel):
+    salary: float
+    monthly_bonus: Optional[float] = None
+    rk_rate: float
+    sn_percentage: float
+    kpi_enabled: bool
+    kpi_percentage: Optional[float] = None
+    kpi_period: Optional[Literal["quarter", "halfyear"]] = None
+    start_year: Optional[int] = None  # по умолчанию текущий год
+    years: int = Field(3, ge=1, le=40)
+    events: List[ProjectionEvent] = Field(default_factory=list, max_length=500)
+
+class SalaryProjectionYear(BaseModel):
+    year: int
+    tax_year: int
+    months: List[MonthResult]
+    summary: SalarySummary
+
+class SalaryProjectionResponse(BaseModel):
+    years: List[SalaryProjectionYear]
+    summary: SalarySummary  # за весь горизонт
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import FrozenSet, Iterable, Mapping, Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import SubscriptionType
+
+logger = logging.getLogger(__name__)
+
+MODULES = [
+    {"name": "calculator",    "path": "/calculator",    "description": "Калькулятор зарплаты"},
+    {"name": "job_generator", "path": "/job_generator", "description": "Генератор вакансий"},
+    {"name": "summary",       "path": "/summary",       "description": "Сводка и форматирование"},
+]
+ALL_MODULES: FrozenSet[str] = frozenset(m["name"] for m in MODULES)
+
+# Лимит записей на модуль, если тариф не найден в subscription_types
+DEFAULT_MAX_HISTORY_ENTRIES = 20
+# Модули по умолчанию для тарифов, у которых enabled_modules не задан в БД
+DEFAULT_TIER_MODULES: Mapping[str, FrozenSet[str]] = {
+    "free": ALL_MODULES - {"summary"},
+}
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    max_history_entries: int
+    modules: FrozenSet[str]
+    # Готовое JSON-тело ответа /api/modules для этого тарифа
+    modules_json: bytes = field(repr=False, compare=False)
+
+
+def _make_tier(name: str, max_history_entries: int, modules: Iterable[str]) -> Tier:
+    enabled = frozenset(modules) & ALL_MODULES
+    body = [{**m, "enabled": m["name"] in enabled} for m in MODULES]
+    return Tier(
+        name=name,
+        max_history_entries=max_history_entries,
+        modules=enabled,
+        modules_json=json.dumps(body, ensure_ascii=False).encode("utf-8"),
+    )
+
+
+def _default_tier(name: str) -> Tier:
+    return _make_tier(name, DEFAULT_MAX_HISTORY_ENTRIES, DEFAULT_TIER_MODULES.get(name, ALL_MODULES))
+
+
+@dataclass(frozen=True)
+class EntitlementsSnapshot:
+    tiers: Mapping[str, Tier]
+    fallback: Tier
+    loaded_at: Optional[datetime] = None
+
+    @classmethod
+    def build(cls, rows: Iterable[SubscriptionType], loaded_at: Optional[datetime] = None) -> "EntitlementsSnapshot":
+        tiers = {name: _default_tier(name) for name in DEFAULT_TIER_MODULES}
+        for row in rows:
+            modules = row.enabled_modules
+            if modules is None:
+                modules = DEFAULT_TIER_MODULES.get(row.name, ALL_MODULES)
+            tiers[row.name] = _make_tier(row.name, row.max_history_entries, modules)
+        return cls(tiers=MappingProxyType(tiers), fallback=_default_tier(""), loaded_at=loaded_at)
+
+    def key(self):
+        return tuple(sorted((t.name, t.max_history_entries, tuple(sorted(t.modules))) for t in self.tiers.values()))
+
+
+class Entitlements:
+    """
+    Per-worker, immutable snapshot of subscription tiers.
+
+    Lookups on the hot path are a dict access on the current snapshot; the
+    snapshot is rebuilt from subscription_types on startup and then polled
+    every ENTITLEMENTS_REFRESH_SECONDS, and replaced atomically when it changes.
+    """
+
+    def __init__(self):
+        self._snapshot = EntitlementsSnapshot.build([])
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> EntitlementsSnapshot:
+        return self._snapshot
+
+    def tier(self, name: str) -> Tier:
+        snapshot = self._snapshot
+        return snapshot.tiers.get(name, snapshot.fallback)
+
+    async def reload(self) -> bool:
+        """Перечитывает тарифы из БД; возвращает True, если снимок изменился."""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(SubscriptionType))).scalars().all()
+        snapshot = EntitlementsSnapshot.build(rows, loaded_at=datetime.now(timezone.utc))
+        changed = snapshot.key() != self._snapshot.key()
+        self._snapshot = snapshot
+        if changed:
+            logger.info("Entitlements reloaded: %s", ", ".join(sorted(snapshot.tiers)))
+        return changed
+
+    async def _poll(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                # остаёмся на предыдущем снимке до следующей попытки
+                logger.warning(f"Entitlements refresh failed: {str(e)}")
+
+    async def start(self) -> None:
+        try:
+            await self.reload()
+        except Exception as e:
+            logger.error(f"Entitlements initial load failed, using defaults: {str(e)}")
+        if settings.ENTITLEMENTS_REFRESH_SECONDS > 0 and self._task is None:
+            self._task = asyncio.create_task(self._poll(settings.ENTITLEMENTS_REFRESH_SECONDS))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+entitlements = Entitlements()
@@ -0,0 +1,105 @@
+import hashlib
+import zlib
+from typing import Optional, Union
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.types import TypeDecorator
+
+from app.config import settings
+
+# Сжатое значение начинается с NUL и номера формата. В тексте из Postgres NUL
+# встретиться не может, поэтому строки, записанные до сжатия, читаются как есть.
+# Несжатый текст, который сам начинается с NUL, хранится с заголовком FORMAT_RAW,
+# иначе его первые байты приняли бы за заголовок.
+MARKER = b"\x00"
+FORMAT_RAW = 0
+FORMAT_ZLIB_DICT_V1 = 1
+
+# Короткие значения не сжимаем: заголовок zlib съедает весь выигрыш
+MIN_COMPRESS_BYTES = 128
+
+# Предустановленный словарь zlib под форму ответа /api/salary и запроса калькулятора,
+# как их сохраняет фронтенд (JSON.stringify, кириллица без экранирования).
+# Словарь — часть формата хранения: его нельзя менять, только добавить новый формат.
+_SALARY_MONTHS = "".join(
+    '{"month":"' + month + '","income":"","kpi_bonus":"0.00","kpi_note":"","tax":"","net_income":"",'
+    '"tax_info":"13% на  руб.","rate_details":"РК: 1.00","cumulative_income":""},'
+    for month in (
+        "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+        "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь",
+    )
+)
+ZDICT_V1 = (
+    '{"salary":,"monthly_bonus":,"rk_rate":1,"sn_percentage":0,"kpi_enabled":false,'
+    '"kpi_percentage":,"kpi_period":"quarter"}"halfyear"'
+    '15% на 18% на 20% на 22% на KPI выплата (квартал)KPI выплата (полгода), СН: '
+    '{"months":[' + _SALARY_MONTHS + '],"summary":{"annual_income":"","annual_tax":"","annual_net_income":""}}'
+).encode("utf-8")
+
+_DICTIONARIES = {FORMAT_ZLIB_DICT_V1: ZDICT_V1}
+
+
+def compress(text: str, level: Optional[int] = None) -> bytes:
+    """Кодирует текст для хранения; короткие и несжимаемые значения остаются обычным UTF-8."""
+    raw = text.encode("utf-8")
+    level = settings.HISTORY_COMPRESSION_LEVEL if level is None else level
+    if level > 0 and len(raw) >= MIN_COMPRESS_BYTES:
+        compressor = zlib.compressobj(level, zdict=ZDICT_V1)
+        packed = MARKER + bytes([FORMAT_ZLIB_DICT_V1]) + compressor.compress(raw) + compressor.flush()
+        if len(packed) < len(raw):
+            return packed
+    if raw.startswith(MARKER):
+        return MARKER + bytes([FORMAT_RAW]) + raw
+    return raw
+
+
+def decompress(value: Union[bytes, memoryview, str]) -> str:
+    # str приходит из SQLite для строк, записанных до перехода на BLOB
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value.startswith(MARKER):
+        return value.decode("utf-8")
+    if value[1:2] == bytes([FORMAT_RAW]):
+        return value[2:].decode("utf-8")
+    try:
+        zdict = _DICTIONARIES[value[1]]
+    except (IndexError, KeyError):
+        raise ValueError(f"Unknown history payload format: {value[1:2]!r}")
+    decompressor = zlib.decompressobj(zdict=zdict)
+    return (decompressor.decompress(value[2:]) + decompressor.flush()).decode("utf-8")
+
+
+def content_hash(query: str, response: str) -> str:
+    """sha256 пары query/response (по исходному тексту, не по сжатому представлению)."""
+    digest = hashlib.sha256()
+    for part in (query.encode("utf-8"), response.encode("utf-8")):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored as bytes through compress()/decompress().
+
+    Values are decoded only when the column is part of the SELECT, so listings
+    that read id/module_name/query_preview never touch the payloads.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress(value)
+
+    @property
+    def python_type(self):
+        return str
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.history_store import insert_many_with_retention
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз пробуем записать пачку, прежде чем выбросить её с ошибкой в логе
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class PendingEntry:
+    user_id: int
+    max_entries: int
+    module_name: str
+    query: str
+    response: str
+    accepted_at: datetime
+    client_id: str
+    attempts: int = 0
+
+
+class HistoryWriteQueue:
+    """
+    Per-worker write-behind buffer for history saves.
+
+    offer() only appends to an in-memory deque; a background task writes
+    the buffer every `interval` seconds, or as soon as `batch_size` entries
+    are waiting, grouping entries per user into insert_many_with_retention()
+    calls inside one transaction, one savepoint per user. If a user's entries
+    fail, they are retried one by one and only the failing ones go back to
+    the queue (and are dropped after MAX_ATTEMPTS). Rows are stored with the
+    time the save was accepted and the client_id returned in the 202, so the
+    entry can be looked up once it is written.
+    The buffer is capped at `max_pending`:
+    when it is full offer() returns None and the caller writes synchronously,
+    which slows producers down instead of dropping data. stop() flushes
+    whatever is left. Entries still buffered when a worker dies are lost.
+    """
+
+    def __init__(self, max_pending: int, batch_size: int, interval: float):
+        self.max_pending = max(max_pending, 1)
+        self.batch_size = max(batch_size, 1)
+        self.interval = interval
+        self._pending: Deque[PendingEntry] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def offer(self, user_id: int, max_entries: int, module_name: str, query: str, response: str) -> Optional[PendingEntry]:
+        if not self.running or len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            return None
+        entry = PendingEntry(
+            user_id=user_id,
+            max_entries=max_entries,
+            module_name=module_name,
+            query=query,
+            response=response,
+            accepted_at=datetime.now(timezone.utc),
+            client_id=uuid.uuid4().hex,
+        )
+        self._pending.append(entry)
+        self.accepted += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return entry
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"History write-behind flush failed: {str(e)}", exc_info=True)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not await self._write(batch):
+                    break
+
+    async def _write(self, batch: List[PendingEntry]) -> bool:
+        by_user: Dict[int, List[PendingEntry]] = {}
+        for entry in batch:
+            by_user.setdefault(entry.user_id, []).append(entry)
+        failed: List[PendingEntry] = []
+        try:
+            async with AsyncSessionLocal() as db:
+                for entries in by_user.values():
+                    # savepoint на пользователя: ошибка в его записях не откатывает записи остальных
+                    if await self._save(db, entries):
+                        continue
+                    # пачка пользователя не записалась — пишем по одной, чтобы отсеять только сбойные
+                    for entry in entries:
+                        if not await self._save(db, [entry]):
+                            failed.append(entry)
+                await db.commit()
+        except Exception as e:
+            # не записалось ничего (БД недоступна, commit не прошёл)
+            self._retry(batch, str(e))
+            return False
+        if len(failed) < len(batch):
+            self.written += len(batch) - len(failed)
+            self.batches += 1
+        if failed:
+            self._retry(failed, "see the errors above")
+            return False
+        return True
+
+    async def _save(self, db, entries: List[PendingEntry]) -> bool:
+        try:
+            async with db.begin_nested():
+                await insert_many_with_retention(
+                    db,
+                    user_id=entries[0].user_id,
+                    max_entries=entries[-1].max_entries,
+                    entries=[(e.module_name, e.query, e.response) for e in entries],
+                    timestamps=[e.accepted_at for e in entries],
+                    client_ids=[e.client_id for e in entries],
+                )
+        except Exception as e:
+            logger.error(f"History write-behind: {len(entries)} entries of user {entries[0].user_id} failed: {str(e)}")
+            return False
+        return True
+
+    def _retry(self, entries: List[PendingEntry], reason: str) -> None:
+        self.failures += 1
+        retry = [entry for entry in entries if entry.attempts + 1 < MAX_ATTEMPTS]
+        for entry in retry:
+            entry.attempts += 1
+        self.dropped += len(entries) - len(retry)
+        # возвращаем в начало очереди в исходном порядке; попробуем на следующем тике
+        self._pending.extendleft(reversed(retry))
+        logger.error(
+            f"History write-behind batch failed ({len(entries)} entries, {len(entries) - len(retry)} dropped): {reason}"
+        )
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        # отменяем фоновую задачу только между записями, чтобы не потерять уже снятую с очереди пачку
+        async with self._flush_lock:
+            self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # при остановке воркера дописываем всё, что осталось в буфере
+        for _ in range(MAX_ATTEMPTS):
+            await self.flush()
+            if not self._pending:
+                break
+        if self._pending:
+            logger.error(f"History write-behind: {len(self._pending)} entries lost on shutdown")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "running": self.running,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "written": self.written,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+
+history_queue = HistoryWriteQueue(
+    settings.HISTORY_QUEUE_MAX,
+    settings.HISTORY_FLUSH_BATCH,
+    settings.HISTORY_FLUSH_INTERVAL_MS / 1000,
+)
@@ -0,0 +1,150 @@
+import html
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import column, func, insert, literal_column, select, table
+from sqlalchemy.dialects.postgresql import TSVECTOR, to_tsvector, websearch_to_tsquery
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import SQLITE_FTS_TABLE, UserHistory
+
+# Конфигурации Postgres: история пишется и на русском, и на английском
+TS_CONFIGS = ("russian", "english")
+# Сколько символов контекста показывать вокруг найденного слова
+SNIPPET_RADIUS = 80
+MAX_TERMS = 8
+
+_fts = table(SQLITE_FTS_TABLE, column("rowid"), column("query"), column("response"))
+
+
+def document_vector(query: str, response: str):
+    """tsvector записи: query с весом A, response с весом B, в каждой из TS_CONFIGS."""
+    vector = None
+    for value, weight in ((query, "A"), (response, "B")):
+        for config in TS_CONFIGS:
+            part = func.setweight(to_tsvector(config, value), literal_column(f"'{weight}'"), type_=TSVECTOR)
+            vector = part if vector is None else vector.op("||", return_type=TSVECTOR)(part)
+    return vector
+
+
+def search_values(dialect_name: str, query: str, response: str) -> Dict[str, Any]:
+    """Дополнительные колонки INSERT для поискового индекса (только Postgres)."""
+    if dialect_name == "postgresql":
+        return {"search_vector": document_vector(query, response)}
+    return {}
+
+
+async def index_entries(db: AsyncSession, dialect_name: str, entries: Sequence[Tuple[int, str, str]]) -> None:
+    """Добавляет (id, query, response) в FTS5-индекс SQLite; в Postgres индекс заполняет сам INSERT."""
+    if dialect_name != "sqlite" or not entries:
+        return
+    await db.execute(
+        insert(_fts).prefix_with("OR REPLACE").values([
+            {"rowid": entry_id, "query": query, "response": response}
+            for entry_id, query, response in entries
+        ])
+    )
+
+
+def _terms(q: str) -> List[str]:
+    return [term.lower() for term in re.findall(r"\w+", q)][:MAX_TERMS]
+
+
+def _stem(term: str) -> str:
+    # грубое отсечение окончаний, чтобы подсветить «разработчика» по запросу «разработчик»
+    return term if len(term) <= 4 else term[:max(4, len(term) - 2)]
+
+
+def make_snippet(texts: Sequence[str], terms: Sequence[str]) -> str:
+    """Фрагмент текста вокруг первого совпадения, совпадения обёрнуты в <b>; остальное HTML-экранировано."""
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(_stem(t)) for t in terms) + r")\w*", re.IGNORECASE)
+    for text in texts:
+        match = pattern.search(text)
+        if match is None:
+            continue
+        start = max(match.start() - SNIPPET_RADIUS, 0)
+        end = min(match.end() + SNIPPET_RADIUS, len(text))
+        fragment = text[start:end]
+        parts, position = [], 0
+        for found in pattern.finditer(fragment):
+            parts.append(html.escape(fragment[position:found.start()]))
+            parts.append("<b>" + html.escape(found.group()) + "</b>")
+            position = found.end()
+        parts.append(html.escape(fragment[position:]))
+        return ("…" if start else "") + "".join(parts) + ("…" if end < len(text) else "")
+    return html.escape(texts[0][:2 * SNIPPET_RADIUS]) if texts else ""
+
+
+async def search_history(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    module_name: Optional[str] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    Ranked full-text search over the user's history.
+
+    Postgres matches the search_vector column (GIN index) against the query
+    parsed with websearch_to_tsquery in every TS_CONFIGS and ranks with
+    ts_rank_cd; SQLite uses the user_history_fts FTS5 table with prefix
+    matching and bm25. Snippets are cut from the decompressed payloads of
+    the returned rows only, since the stored text is compressed.
+    """
+    terms = _terms(q)
+    if not terms:
+        return []
+
+    dialect_name = db.get_bind().dialect.name
+    columns = (
+        UserHistory.id,
+        UserHistory.module_name,
+        UserHistory.query_preview,
+        UserHistory.timestamp,
+        UserHistory.query,
+        UserHistory.response,
+    )
+    if dialect_name == "postgresql":
+        tsquery = None
+        for config in TS_CONFIGS:
+            part = websearch_to_tsquery(config, q)
+            tsquery = part if tsquery is None else tsquery.op("||")(part)
+        rank = func.ts_rank_cd(UserHistory.search_vector, tsquery)
+        statement = (
+            select(*columns, rank.label("rank"))
+            .where(UserHistory.user_id == user_id, UserHistory.search_vector.op("@@")(tsquery))
+            .order_by(rank.desc(), UserHistory.timestamp.desc())
+        )
+    elif dialect_name == "sqlite":
+        # bm25() тем меньше, чем релевантнее; каждое слово ищется как префикс, операторы FTS5 из ввода не проходят
+        rank = func.bm25(literal_column(SQLITE_FTS_TABLE))
+        statement = (
+            select(*columns, (-rank).label("rank"))
+            .join(_fts, _fts.c.rowid == UserHistory.id)
+            .where(
+                UserHistory.user_id == user_id,
+                literal_column(SQLITE_FTS_TABLE).op("MATCH")(" ".join(f'"{term}"*' for term in terms)),
+            )
+            .order_by(rank, UserHistory.timestamp.desc())
+        )
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=f"History search is not supported on {dialect_name}",
+        )
+
+    if module_name:
+        statement = statement.where(UserHistory.module_name == module_name)
+    rows = (await db.execute(statement.limit(limit))).all()
+    return [
+        {
+            "id": row.id,
+            "module_name": row.module_name,
+            "query_preview": row.query_preview or "",
+            "timestamp": row.timestamp.isoformat() if hasattr(row.timestamp, 'isoformat') else str(row.timestamp),
+            "rank": float(row.rank or 0.0),
+            "snippet": make_snippet((row.query, row.response), terms),
+        }
+        for row in rows
+    ]
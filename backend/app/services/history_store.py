@@ -0,0 +1,331 @@
+import base64
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DateTime, and_, case, delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.database import AsyncSessionLocal
+from app.models import UserHistory
+from app.services.history_codec import content_hash
+from app.services.history_search import index_entries, search_values
+
+# Длина превью query, которое хранится рядом с записью для списков истории
+PREVIEW_LENGTH = 200
+# Сколько строк экспорт забирает из курсора за один раз
+EXPORT_CHUNK_ROWS = 500
+
+
+def query_preview(query: str) -> str:
+    return query[:PREVIEW_LENGTH]
+
+
+def encode_cursor(timestamp: datetime, entry_id: int) -> str:
+    """Непрозрачный курсор keyset-пагинации: позиция (timestamp, id) последней выданной записи."""
+    raw = f"{timestamp.isoformat()}|{entry_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, int]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, entry_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def before_cursor(timestamp: datetime, entry_id: int):
+    """
+    Условие «строго после позиции курсора» в порядке (timestamp DESC, id DESC).
+
+    Сравнивается только с (timestamp, id) из самого курсора: текущий timestamp
+    строки-курсора мог измениться (повторное сохранение поднимает запись наверх).
+    В SQLite даты хранятся строкой: CURRENT_TIMESTAMP пишет их без долей секунды,
+    SQLAlchemy — с микросекундами, поэтому параметр форматируется так же, как
+    записана строка с таким значением.
+    """
+    timestamp_type = DateTime(timezone=True).with_variant(
+        sqlite.DATETIME(truncate_microseconds=not timestamp.microsecond), "sqlite"
+    )
+    return tuple_(UserHistory.timestamp, UserHistory.id) < tuple_(literal(timestamp, timestamp_type), entry_id)
+
+
+def retention_delete(user_id: int, module_name: str, max_entries: int, incoming: int = 1):
+    """
+    DELETE of every (user, module) entry beyond the newest `max_entries - incoming`,
+    making room for `incoming` new rows without a separate count().
+    """
+    ranked = (
+        select(
+            UserHistory.id,
+            func.row_number()
+            .over(order_by=(UserHistory.timestamp.desc(), UserHistory.id.desc()))
+            .label("position"),
+        )
+        .where(UserHistory.user_id == user_id, UserHistory.module_name == module_name)
+        .subquery()
+    )
+    stale = select(ranked.c.id).where(ranked.c.position > max_entries - incoming)
+    return delete(UserHistory).where(UserHistory.id.in_(stale))
+
+
+def retention_delete_many(user_id: int, incoming: Dict[str, int], max_entries: int):
+    """
+    Same as retention_delete() for several modules in one DELETE: each module
+    keeps its newest `max_entries - incoming[module]` entries.
+    """
+    ranked = (
+        select(
+            UserHistory.id,
+            UserHistory.module_name,
+            func.row_number()
+            .over(
+                partition_by=UserHistory.module_name,
+                order_by=(UserHistory.timestamp.desc(), UserHistory.id.desc()),
+            )
+            .label("position"),
+        )
+        .where(UserHistory.user_id == user_id, UserHistory.module_name.in_(list(incoming)))
+        .subquery()
+    )
+    keep = case(
+        {module: max_entries - count for module, count in incoming.items()},
+        value=ranked.c.module_name,
+    )
+    stale = select(ranked.c.id).where(ranked.c.position > keep)
+    return delete(UserHistory).where(UserHistory.id.in_(stale))
+
+
+def _upsert(dialect_name: str, values):
+    """
+    INSERT, который при совпадении (user_id, module_name, content_hash) только
+    обновляет timestamp — на переданный во values или now() по умолчанию колонки —
+    и client_id, если он передан.
+    """
+    if dialect_name == "postgresql":
+        statement = pg_insert(UserHistory).values(values)
+    elif dialect_name == "sqlite":
+        statement = sqlite_insert(UserHistory).values(values)
+    else:
+        return insert(UserHistory).values(values)
+    return statement.on_conflict_do_update(
+        index_elements=[UserHistory.user_id, UserHistory.module_name, UserHistory.content_hash],
+        set_={
+            "timestamp": statement.excluded.timestamp,
+            "client_id": func.coalesce(statement.excluded.client_id, UserHistory.client_id),
+        },
+    )
+
+
+def _touch(user_id: int, *criteria, **values):
+    """UPDATE timestamp = now() (или переданные значения колонок) для уже сохранённых копий записей."""
+    return (
+        update(UserHistory)
+        .where(UserHistory.user_id == user_id, *criteria)
+        .values(**{"timestamp": func.now(), **values})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def insert_with_retention(
+    db: AsyncSession,
+    user_id: int,
+    max_entries: int,
+    module_name: str,
+    query: str,
+    response: str,
+) -> Tuple[int, datetime]:
+    """
+    Inserts a history entry and trims the module's history to `max_entries`.
+
+    If the same query/response pair is already stored for the module, only
+    its timestamp is bumped: a single UPDATE through uq_user_history_content,
+    no new row and no retention delete.
+
+    Otherwise on Postgres this is one round trip: a data-modifying CTE that
+    deletes the stale rows and inserts the new one. Both parts see the same
+    snapshot, so concurrent saves may briefly leave one extra row, which the
+    next save removes. Other backends run the same DELETE and the INSERT as
+    two statements. The caller commits.
+    """
+    digest = content_hash(query, response)
+    touched = (await db.execute(
+        _touch(user_id, UserHistory.module_name == module_name, UserHistory.content_hash == digest)
+        .returning(UserHistory.id, UserHistory.timestamp)
+    )).first()
+    if touched is not None:
+        return touched.id, touched.timestamp
+
+    dialect_name = db.get_bind().dialect.name
+    trim = retention_delete(user_id, module_name, max_entries)
+    # ON CONFLICT — на случай параллельного первого сохранения той же пары
+    row = _upsert(dialect_name, dict(
+        user_id=user_id, module_name=module_name, query=query, response=response,
+        query_preview=query_preview(query), content_hash=digest,
+        **search_values(dialect_name, query, response),
+    )).returning(UserHistory.id, UserHistory.timestamp)
+
+    if dialect_name == "postgresql":
+        inserted = row.cte("inserted")
+        statement = select(inserted.c.id, inserted.c.timestamp).add_cte(trim.cte("trimmed"))
+        result = await db.execute(statement)
+    else:
+        await db.execute(trim)
+        result = await db.execute(row)
+    entry_id, timestamp = result.one()
+    await index_entries(db, dialect_name, [(entry_id, query, response)])
+    return entry_id, timestamp
+
+
+async def insert_many_with_retention(
+    db: AsyncSession,
+    user_id: int,
+    max_entries: int,
+    entries: Sequence[Tuple[str, str, str]],
+    timestamps: Optional[Sequence[datetime]] = None,
+    client_ids: Optional[Sequence[str]] = None,
+) -> List[Tuple[int, str, str, datetime]]:
+    """
+    Batch version of insert_with_retention() for (module_name, query, response)
+    tuples, oldest first. Entries already stored (or repeated within the batch)
+    only get their timestamp bumped, in one UPDATE. Retention then runs once
+    for the rest of the batch and the new rows go in as one multi-row INSERT;
+    entries that would be trimmed right away (more than `max_entries` for a
+    module) are not inserted at all.
+
+    `timestamps`, one per entry, are stored instead of now() (the write-behind
+    queue saves the time a request was accepted, not the time of the flush).
+    `client_ids`, one per entry, are stored in client_id; a repeated save
+    moves the existing row to the latest client_id.
+
+    Returns (id, module_name, query_preview, timestamp) of the saved rows.
+    The caller commits.
+    """
+    # Повторы внутри пачки схлопываем в последнее вхождение
+    unique: Dict[Tuple[str, str], Tuple[str, str, Optional[datetime], Optional[str]]] = {}
+    for index, (module_name, query, response) in enumerate(entries):
+        key = (module_name, content_hash(query, response))
+        unique.pop(key, None)
+        unique[key] = (
+            query,
+            response,
+            timestamps[index] if timestamps is not None else None,
+            client_ids[index] if client_ids is not None else None,
+        )
+
+    def per_entry(position: int, column):
+        # значение колонки для каждой уже сохранённой копии: CASE по (module_name, content_hash)
+        return case(*[
+            (
+                and_(UserHistory.module_name == module_name, UserHistory.content_hash == digest),
+                literal(values[position], column.type),
+            )
+            for (module_name, digest), values in unique.items()
+        ])
+
+    bumped = {}
+    if timestamps is not None:
+        bumped["timestamp"] = per_entry(2, UserHistory.timestamp)
+    if client_ids is not None:
+        bumped["client_id"] = per_entry(3, UserHistory.client_id)
+    touched = (await db.execute(
+        _touch(user_id, tuple_(UserHistory.module_name, UserHistory.content_hash).in_(list(unique)), **bumped)
+        .returning(
+            UserHistory.id, UserHistory.module_name, UserHistory.content_hash,
+            UserHistory.query_preview, UserHistory.timestamp,
+        )
+    )).all()
+    saved = []
+    for entry_id, module_name, digest, preview, timestamp in touched:
+        del unique[(module_name, digest)]
+        saved.append((entry_id, module_name, preview, timestamp))
+
+    # Оставляем только последние max_entries записей каждого модуля из пачки
+    kept: List[Tuple[str, str, str, str, Optional[datetime], Optional[str]]] = []
+    incoming: Dict[str, int] = {}
+    for (module_name, digest), (query, response, timestamp, client_id) in reversed(unique.items()):
+        if incoming.get(module_name, 0) < max_entries:
+            incoming[module_name] = incoming.get(module_name, 0) + 1
+            kept.append((module_name, digest, query, response, timestamp, client_id))
+    kept.reverse()
+    if not kept:
+        return sorted(saved, key=lambda row: row[0])
+
+    dialect_name = db.get_bind().dialect.name
+    trim = retention_delete_many(user_id, incoming, max_entries)
+    rows = _upsert(dialect_name, [
+        {
+            "user_id": user_id,
+            "module_name": module_name,
+            "query": query,
+            "response": response,
+            "query_preview": query_preview(query),
+            "content_hash": digest,
+            **search_values(dialect_name, query, response),
+            **({"timestamp": timestamp} if timestamp is not None else {}),
+            **({"client_id": client_id} if client_id is not None else {}),
+        }
+        for module_name, digest, query, response, timestamp, client_id in kept
+    ]).returning(
+        UserHistory.id, UserHistory.module_name, UserHistory.query_preview, UserHistory.timestamp,
+        UserHistory.content_hash,
+    )
+
+    if dialect_name == "postgresql":
+        inserted = rows.cte("inserted")
+        statement = select(
+            inserted.c.id, inserted.c.module_name, inserted.c.query_preview, inserted.c.timestamp,
+            inserted.c.content_hash,
+        ).add_cte(trim.cte("trimmed"))
+        result = await db.execute(statement)
+    else:
+        await db.execute(trim)
+        result = await db.execute(rows)
+    payloads = {(module_name, digest): (query, response) for module_name, digest, query, response, _, _ in kept}
+    inserted_rows = result.all()
+    await index_entries(db, dialect_name, [
+        (row.id, *payloads[(row.module_name, row.content_hash)]) for row in inserted_rows
+    ])
+    saved.extend((row.id, row.module_name, row.query_preview, row.timestamp) for row in inserted_rows)
+    # RETURNING не гарантирует порядок строк
+    return sorted(saved, key=lambda row: row[0])
+
+
+async def stream_history(
+    user_id: int,
+    module_name: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    session_factory: async_sessionmaker = AsyncSessionLocal,
+) -> AsyncIterator[Sequence]:
+    """
+    Yields the user's history oldest first, EXPORT_CHUNK_ROWS rows at a time,
+    through a server-side cursor, so memory does not grow with history size.
+
+    Opens its own session: a StreamingResponse body is consumed after the
+    request's dependencies have been closed. The connection stays checked
+    out until the export has been read or the client disconnects.
+    """
+    query = select(
+        UserHistory.id,
+        UserHistory.module_name,
+        UserHistory.timestamp,
+        UserHistory.query,
+        UserHistory.response,
+    ).where(UserHistory.user_id == user_id)
+    if module_name:
+        query = query.where(UserHistory.module_name == module_name)
+    if since is not None:
+        query = query.where(UserHistory.timestamp >= since)
+    if until is not None:
+        query = query.where(UserHistory.timestamp < until)
+    query = query.order_by(UserHistory.timestamp, UserHistory.id).execution_options(yield_per=EXPORT_CHUNK_ROWS)
+
+    async with session_factory() as db:
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield rows
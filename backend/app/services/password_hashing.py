@@ -0,0 +1,40 @@
+import time
+from typing import Any, Callable
+
+import bcrypt
+
+# Функции здесь выполняются в spawn-процессах PasswordPool: процесс импортирует
+# модуль функции по имени, поэтому этот модуль не тянет FastAPI, SQLAlchemy и app.*
+
+
+def hash_password(password: str) -> str:
+    # Bcrypt has a 72-byte limit, truncate if necessary
+    password_bytes = password.encode('utf-8')
+    if len(password_bytes) > 72:
+        # Truncate to 72 bytes (not characters)
+        password_bytes = password_bytes[:72]
+    # Generate salt and hash password
+    salt = bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password_bytes, salt)
+    # Return as string (bcrypt hash is always $2b$... format)
+    return hashed.decode('utf-8')
+
+
+def verify_password(plain: str, hashed: str) -> bool:
+    # Apply same truncation logic for verification
+    password_bytes = plain.encode('utf-8')
+    if len(password_bytes) > 72:
+        password_bytes = password_bytes[:72]
+    # Verify password
+    try:
+        return bcrypt.checkpw(password_bytes, hashed.encode('utf-8'))
+    except Exception:
+        return False
+
+
+def timed_call(fn: Callable[..., Any], *args: Any):
+    """Выполняется в процессе пула: возвращает результат, время старта и длительность."""
+    started_at = time.time()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, started_at, time.perf_counter() - t0
@@ -0,0 +1,146 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.password_hashing import timed_call
+
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
+class PasswordPool:
+    """
+    Size-capped process pool for bcrypt hashing and verification.
+
+    bcrypt holds the CPU for hundreds of milliseconds per call, so it runs in
+    separate processes instead of the worker's threadpool. At most
+    `max_pending` calls may be queued or running at once; beyond that the
+    request fails fast with 503, which also caps how many request threads can
+    be parked waiting on password work. With `workers=0` calls run inline.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max(max_pending, 1)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.exec_seconds_total = 0.0
+        self.exec_seconds_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn вместо fork: воркер gunicorn к этому моменту уже многопоточный
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _acquire(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.rejected += 1
+            raise _busy()
+        with self._stats_lock:
+            self.pending += 1
+
+    def _release(self) -> None:
+        with self._stats_lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._acquire()
+        try:
+            submitted_at = time.time()
+            if self.workers <= 0:
+                result, started_at, exec_seconds = timed_call(fn, *args)
+            else:
+                try:
+                    future = self._get_executor().submit(timed_call, fn, *args)
+                    result, started_at, exec_seconds = future.result()
+                except BrokenProcessPool:
+                    self._reset()
+                    raise _busy()
+            self._record(max(started_at - submitted_at, 0.0), exec_seconds)
+            return result
+        finally:
+            self._release()
+
+    async def run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Как run(), но ожидает результат без блокировки event loop и без занятия потока."""
+        self._acquire()
+        try:
+            submitted_at = time.time()
+            if self.workers <= 0:
+                result, started_at, exec_seconds = await run_in_threadpool(timed_call, fn, *args)
+            else:
+                try:
+                    future = self._get_executor().submit(timed_call, fn, *args)
+                    result, started_at, exec_seconds = await asyncio.wrap_future(future)
+                except BrokenProcessPool:
+                    self._reset()
+                    raise _busy()
+            self._record(max(started_at - submitted_at, 0.0), exec_seconds)
+            return result
+        finally:
+            self._release()
+
+    def _record(self, wait_seconds: float, exec_seconds: float) -> None:
+        with self._stats_lock:
+            self.completed += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+            self.exec_seconds_total += exec_seconds
+            self.exec_seconds_max = max(self.exec_seconds_max, exec_seconds)
+
+    def _reset(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            done = self.completed
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "completed": done,
+                "rejected": self.rejected,
+                "wait_seconds_avg": self.wait_seconds_total / done if done else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+                "exec_seconds_avg": self.exec_seconds_total / done if done else 0.0,
+                "exec_seconds_max": self.exec_seconds_max,
+            }
+
+
+password_pool = PasswordPool(settings.PASSWORD_POOL_WORKERS, settings.PASSWORD_POOL_MAX_PENDING)
@@ -0,0 +1,170 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from app.salary_router import MONTH_NAMES, format_number, format_number_decimal
+from app.schemas import SalaryRequest
+from app.services.tax_rules import TaxSchedule, tax_rules
+
+QUARTER_MONTHS = [3, 6, 9, 11]
+HALFYEAR_MONTHS = [5, 11]
+
+
+def _column(values: Sequence[float]) -> np.ndarray:
+    return np.array(values, dtype=np.float64)
+
+
+def _month_parts(schedule: TaxSchedule, gross: np.ndarray, cumulative: np.ndarray):
+    """
+    TaxSchedule.month_parts() над матрицей месяцев: налог, первая затронутая
+    ступень, число ступеней и облагаемые суммы по ступеням (ось 2).
+    """
+    before = cumulative - gross
+    thresholds = np.array(schedule.thresholds)
+    last = np.searchsorted(thresholds, cumulative, side="left")
+    first = np.minimum(np.searchsorted(thresholds, before, side="right"), last)
+    taxed = (cumulative > 0) & (gross > 0)
+    tax = np.zeros(gross.shape)
+    amounts = []
+    for k, (threshold, lower, rate) in enumerate(zip(schedule.thresholds, schedule.lower, schedule.rates)):
+        amount = np.where(
+            k == last, np.minimum(gross, cumulative - lower),
+            np.where(k == first, threshold - before, threshold - lower),
+        )
+        tax = np.where(taxed & (first <= k) & (k <= last), tax + amount * rate, tax)
+        amounts.append(amount)
+    count = np.where(taxed, last - first + 1, 0)
+    return tax, first, count, np.stack(amounts, axis=2)
+
+
+def _cents(values: List[float]) -> List[float]:
+    return [round(value, 2) for value in values]
+
+
+def calculate_salary_batch(requests: Sequence[SalaryRequest], raw: bool = False) -> List[Dict[str, Any]]:
+    """
+    calculate_salary() for many scenarios at once over a (scenarios × 12) float64 array.
+
+    Every arithmetic step mirrors the scalar function operation for operation
+    (same order, same operands), and cumsum along the months axis adds
+    left to right exactly like the scalar loop, so the formatted output is
+    identical to calculate_salary(request).model_dump() for each request.
+    Scenarios are taxed per tax year; only the string formatting stays a
+    Python loop. raw=True returns raw_salary() dicts and skips it entirely.
+    """
+    n = len(requests)
+    if n == 0:
+        return []
+
+    salary = _column([r.salary for r in requests])
+    monthly_bonus = _column([r.monthly_bonus or 0.0 for r in requests])
+    rk_rate = _column([r.rk_rate for r in requests])
+    sn_percentage = _column([r.sn_percentage for r in requests]) / 100.0
+    kpi_fraction = _column([r.kpi_percentage or 0.0 for r in requests]) / 100.0
+
+    base_income = (salary + monthly_bonus) * rk_rate
+    monthly_regular = base_income + base_income * sn_percentage
+    yearly_gross = monthly_regular * 12
+
+    # Раскладка KPI: та же ветка, что и в calculate_salary (всё, что не quarter, считается как halfyear)
+    kpi_on = np.array([bool(r.kpi_enabled and r.kpi_percentage) for r in requests])
+    is_quarter = kpi_on & np.array([r.kpi_period == "quarter" for r in requests])
+    is_halfyear = kpi_on & ~is_quarter
+    quarterly_bonus = monthly_regular * kpi_fraction * 3
+    halfyear_bonus = monthly_regular * kpi_fraction * 6
+    yearly_gross = np.where(is_quarter, yearly_gross + quarterly_bonus * 4, yearly_gross)
+    yearly_gross = np.where(is_halfyear, yearly_gross + halfyear_bonus * 2, yearly_gross)
+
+    bonus_month = np.zeros((n, 12), dtype=bool)
+    bonus_month[np.ix_(is_quarter, QUARTER_MONTHS)] = True
+    bonus_month[np.ix_(is_halfyear, HALFYEAR_MONTHS)] = True
+    # выплата только при точном совпадении периода; при kpi_period=None месяц помечен, но бонус 0
+    paid = np.where(
+        is_quarter, quarterly_bonus,
+        np.where(is_halfyear & np.array([r.kpi_period == "halfyear" for r in requests]), halfyear_bonus, 0.0),
+    )
+    bonus = np.where(bonus_month, paid[:, None], 0.0)
+    gross = np.where(bonus_month, monthly_regular[:, None] + bonus, monthly_regular[:, None])
+    cumulative = np.cumsum(gross, axis=1)
+
+    # Прогрессивная шкала по доходу нарастающим итогом, отдельно для каждого налогового года
+    years = np.array([tax_rules.resolve_year(r.tax_year) for r in requests])
+    tax = np.zeros((n, 12))
+    first_part = np.zeros((n, 12), dtype=np.int64)
+    part_count = np.zeros((n, 12), dtype=np.int64)
+    # у разных лет разное число ступеней, поэтому суммы по ступеням и подписи хранятся построчно
+    part_amount: List[Any] = [None] * n
+    labels: List[Any] = [None] * n
+    for year in np.unique(years).tolist():
+        rows = np.flatnonzero(years == year)
+        schedule = tax_rules.schedule(year)
+        year_tax, year_first, year_count, year_amount = _month_parts(schedule, gross[rows], cumulative[rows])
+        tax[rows], first_part[rows], part_count[rows] = year_tax, year_first, year_count
+        if raw:
+            continue
+        for row, amounts in zip(rows.tolist(), year_amount.tolist()):
+            part_amount[row], labels[row] = amounts, schedule.labels
+
+    total_tax = np.cumsum(tax, axis=1)[:, -1]
+    net = gross - tax
+    yearly_net = yearly_gross - total_tax
+
+    gross_l, tax_l, net_l = gross.tolist(), tax.tolist(), net.tolist()
+    cumulative_l, bonus_l, bonus_month_l = cumulative.tolist(), bonus.tolist(), bonus_month.tolist()
+    if raw:
+        yearly_gross_l, total_tax_l, yearly_net_l = yearly_gross.tolist(), total_tax.tolist(), yearly_net.tolist()
+        return [
+            {
+                "tax_year": year,
+                "income": _cents(gross_l[i]),
+                "kpi_bonus": _cents(bonus_l[i]),
+                "tax": _cents(tax_l[i]),
+                "net_income": _cents(net_l[i]),
+                "cumulative_income": _cents(cumulative_l[i]),
+                "summary": {
+                    "annual_income": round(yearly_gross_l[i], 2),
+                    "annual_tax": round(total_tax_l[i], 2),
+                    "annual_net_income": round(yearly_net_l[i], 2),
+                },
+            }
+            for i, year in enumerate(years.tolist())
+        ]
+    # строки tax_info затрагивают подряд идущие ступени: от первой, всего count штук
+    first_part_l, part_count_l = first_part.tolist(), part_count.tolist()
+
+    results = []
+    for i, request in enumerate(requests):
+        rate_details = f"РК: {request.rk_rate:.2f}"
+        if request.sn_percentage / 100.0 > 0:
+            rate_details += f", СН: {request.sn_percentage:.1f}%"
+        kpi_note = f"KPI выплата ({'квартал' if is_quarter[i] else 'полгода'})"
+        row_labels = labels[i]
+
+        months = []
+        for m in range(12):
+            first, amounts = first_part_l[i][m], part_amount[i][m]
+            tax_info = " ".join(
+                f"{row_labels[k]}% на {format_number(amounts[k])} руб."
+                for k in range(first, first + part_count_l[i][m])
+            )
+            month_bonus = bonus_l[i][m]
+            months.append({
+                "month": MONTH_NAMES[m],
+                "income": format_number_decimal(gross_l[i][m]),
+                "kpi_bonus": format_number_decimal(month_bonus) if month_bonus > 0 else "0.00",
+                "kpi_note": kpi_note if bonus_month_l[i][m] else "",
+                "tax": format_number_decimal(tax_l[i][m]),
+                "net_income": format_number_decimal(net_l[i][m]),
+                "tax_info": tax_info,
+                "rate_details": rate_details,
+                "cumulative_income": format_number_decimal(cumulative_l[i][m]),
+            })
+        results.append({
+            "months": months,
+            "summary": {
+                "annual_income": format_number_decimal(float(yearly_gross[i])),
+                "annual_tax": format_number_decimal(float(total_tax[i])),
+                "annual_net_income": format_number_decimal(float(yearly_net[i])),
+            },
+        })
+    return results
@@ -0,0 +1,114 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.config import settings
+from app.schemas import SalaryRequest
+from app.services.tax_rules import tax_rules
+
+# Суммы считаем до копеек, коэффициенты и проценты — до 1e-4: шум вроде 0.1 + 0.2 даёт тот же ключ
+MONEY_DIGITS = 2
+RATE_DIGITS = 4
+
+
+def normalize_request(request: SalaryRequest) -> SalaryRequest:
+    """
+    Каноническая форма запроса, от которой и считается результат.
+
+    Выключенный KPI (или KPI с нулевым процентом) сбрасывает kpi_percentage и
+    kpi_period: calculate_salary() их в этом случае не использует. Пустой
+    tax_year заменяется годом по умолчанию.
+    """
+    kpi_enabled = bool(request.kpi_enabled and request.kpi_percentage)
+    return SalaryRequest.model_construct(
+        # + 0.0 превращает -0.0 в 0.0
+        salary=round(request.salary, MONEY_DIGITS) + 0.0,
+        monthly_bonus=round(request.monthly_bonus or 0.0, MONEY_DIGITS) + 0.0,
+        rk_rate=round(request.rk_rate, RATE_DIGITS) + 0.0,
+        sn_percentage=round(request.sn_percentage, RATE_DIGITS) + 0.0,
+        kpi_enabled=kpi_enabled,
+        kpi_percentage=round(request.kpi_percentage, RATE_DIGITS) + 0.0 if kpi_enabled else None,
+        kpi_period=request.kpi_period if kpi_enabled else None,
+        tax_year=tax_rules.resolve_year(request.tax_year),
+    )
+
+
+def cache_key(request: SalaryRequest) -> tuple:
+    """Ключ кэша для запроса, уже прошедшего normalize_request()."""
+    return (
+        request.salary,
+        request.monthly_bonus,
+        request.rk_rate,
+        request.sn_percentage,
+        request.kpi_percentage,
+        request.kpi_period,
+        request.tax_year,
+    )
+
+
+class SalaryCache:
+    """
+    Bounded LRU for results of pure salary calculations: serialized
+    /api/salary responses keyed by cache_key(), and the last projection per
+    set of starting conditions for /api/salary/projection.
+
+    Cached values are pure functions of their key, so entries never expire;
+    they are only evicted by size. The cache lives in each worker
+    process: a cross-worker tier would cost an IPC or network round trip
+    on every request, while the hot set fits in each worker's cache anyway
+    (benchmarks/salary_cache_workers.py compares the hit rates).
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+salary_cache = SalaryCache(settings.SALARY_CACHE_SIZE)
+projection_cache = SalaryCache(settings.SALARY_PROJECTION_CACHE_SIZE)
@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.tax_rules import tax_rules
+
+# Месяц выплаты KPI (0 = январь) -> месяцы года, за которые он начисляется; как в calculate_salary()
+KPI_PAYMENTS = {
+    "quarter": {3: range(0, 3), 6: range(3, 6), 9: range(6, 9), 11: range(9, 12)},
+    "halfyear": {5: range(0, 6), 11: range(6, 12)},
+}
+KPI_PERIOD_NAMES = {"quarter": "квартал", "halfyear": "полгода"}
+
+# Событие: (месяц от начала прогноза, вид, значение, длительность в месяцах)
+Event = Tuple[int, str, float, int]
+
+
+@dataclass(frozen=True)
+class ProjectionBase:
+    """Условия на первый месяц прогноза; всё, что меняется позже, задаётся событиями."""
+    salary: float
+    monthly_bonus: float
+    rk_rate: float
+    sn_percentage: float
+    kpi_percentage: float  # 0 — KPI выключен
+    kpi_period: Optional[str]
+    start_year: int
+    years: int
+
+
+@dataclass(frozen=True)
+class MonthState:
+    """Итог одного месяца прогноза; следующий месяц считается только из него и событий."""
+    salary: float
+    rk_rate: float
+    sn_percentage: float
+    regular: float  # доход месяца без KPI, с учётом неоплачиваемого отпуска
+    bonus: float
+    gross: float
+    cumulative: float  # с начала календарного года
+    tax: float
+    tax_parts: Tuple[Tuple[str, float], ...]
+    tax_year: int
+
+
+class SalaryProjection:
+    """
+    Month-by-month salary state over a multi-year horizon.
+
+    Month i depends only on month i - 1, the events dated i and the earlier
+    months of the same calendar year (for KPI payments), so with_events()
+    keeps the states before the first month whose events changed and
+    recomputes from there on. Instances are never mutated: the new
+    projection shares the unchanged prefix with the old one.
+    """
+
+    def __init__(self, base: ProjectionBase, events: Sequence[Event], states: List[MonthState]):
+        self.base = base
+        self.events = tuple(events)
+        self.states = states
+        self._by_month: Dict[int, List[Event]] = {}
+        for event in self.events:
+            self._by_month.setdefault(event[0], []).append(event)
+        self._indexations = [event for event in self.events if event[1] == "indexation"]
+        self._leaves = [event for event in self.events if event[1] == "unpaid_leave"]
+
+    @property
+    def months(self) -> int:
+        return self.base.years * 12
+
+    @classmethod
+    def build(cls, base: ProjectionBase, events: Sequence[Event]) -> "SalaryProjection":
+        projection = cls(base, events, [])
+        projection._compute_from(0)
+        return projection
+
+    def with_events(self, events: Sequence[Event]) -> Tuple["SalaryProjection", int]:
+        """Прогноз с другим набором событий и номер первого пересчитанного месяца."""
+        projection = SalaryProjection(self.base, events, [])
+        changed = [
+            month for month in set(self._by_month) | set(projection._by_month)
+            if self._by_month.get(month) != projection._by_month.get(month)
+        ]
+        start = min(changed, default=self.months)
+        projection.states = self.states[:start]
+        projection._compute_from(start)
+        return projection, start
+
+    def _compute_from(self, start: int) -> None:
+        base = self.base
+        for index in range(start, self.months):
+            previous = self.states[index - 1] if index else None
+            salary = previous.salary if previous else base.salary
+            rk_rate = previous.rk_rate if previous else base.rk_rate
+            sn_percentage = previous.sn_percentage if previous else base.sn_percentage
+
+            for _, kind, value, _ in self._by_month.get(index, ()):
+                if kind == "salary":
+                    salary = value
+                elif kind in ("raise", "indexation"):
+                    salary = salary * (1 + value / 100.0)
+                elif kind == "rk":
+                    rk_rate = value
+                elif kind == "sn":
+                    sn_percentage = value
+            # индексация повторяется каждые 12 месяцев после своей даты
+            for month, _, value, _ in self._indexations:
+                if index > month and (index - month) % 12 == 0:
+                    salary = salary * (1 + value / 100.0)
+            unpaid = max(
+                (value for month, _, value, duration in self._leaves if month <= index < month + duration),
+                default=0.0,
+            )
+
+            base_income = (salary + base.monthly_bonus) * rk_rate
+            regular = base_income + base_income * (sn_percentage / 100.0)
+            if unpaid:
+                regular = regular * (1 - unpaid)
+
+            month_of_year = index % 12
+            year_start = index - month_of_year
+            bonus = 0.0
+            if base.kpi_percentage and base.kpi_period:
+                period = KPI_PAYMENTS[base.kpi_period].get(month_of_year)
+                if period is not None:
+                    earned = sum(
+                        regular if m == month_of_year else self.states[year_start + m].regular for m in period
+                    )
+                    bonus = earned * (base.kpi_percentage / 100.0)
+            gross = regular + bonus
+            cumulative = (previous.cumulative if previous and month_of_year else 0.0) + gross
+
+            tax_year = previous.tax_year if previous and month_of_year else tax_rules.year_for(base.start_year + index // 12)
+            schedule = tax_rules.schedule(tax_year)
+            tax = 0.0
+            tax_parts = []
+            for bracket, amount in schedule.month_parts(cumulative, gross):
+                tax += amount * schedule.rates[bracket]
+                tax_parts.append((schedule.labels[bracket], amount))
+
+            self.states.append(MonthState(
+                salary=salary,
+                rk_rate=rk_rate,
+                sn_percentage=sn_percentage,
+                regular=regular,
+                bonus=bonus,
+                gross=gross,
+                cumulative=cumulative,
+                tax=tax,
+                tax_parts=tuple(tax_parts),
+                tax_year=tax_year,
+            ))
@@ -0,0 +1,139 @@
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.config import settings
+
+# Шкалы по годам лежат в данных, а не в коде: новый год — новая запись в файле
+DEFAULT_RULES_FILE = Path(__file__).resolve().parent.parent / "data" / "tax_rules.json"
+
+
+@dataclass(frozen=True)
+class TaxSchedule:
+    """
+    Precompiled progressive scale for one tax year.
+
+    Bracket k covers cumulative income in (lower[k], thresholds[k]]; the last
+    threshold is inf. cumulative_tax[k] is the tax due on exactly lower[k],
+    so the tax on any income is one bisect plus one multiplication.
+    net_thresholds[k] is the income after tax at thresholds[k], which makes
+    the inverse (gross for a given net) the same kind of lookup.
+    """
+
+    year: int
+    thresholds: Tuple[float, ...]
+    lower: Tuple[float, ...]
+    rates: Tuple[float, ...]
+    labels: Tuple[str, ...]
+    cumulative_tax: Tuple[float, ...]
+    net_thresholds: Tuple[float, ...]
+
+    @classmethod
+    def compile(cls, year: int, brackets: List[Tuple[Optional[float], float]]) -> "TaxSchedule":
+        thresholds, rates = [], []
+        for up_to, rate in brackets:
+            thresholds.append(float("inf") if up_to is None else float(up_to))
+            rates.append(float(rate))
+        if not thresholds or thresholds[-1] != float("inf"):
+            raise ValueError(f"tax year {year}: the last bracket must have up_to = null")
+        if any(a >= b for a, b in zip(thresholds, thresholds[1:])) or thresholds[0] <= 0:
+            raise ValueError(f"tax year {year}: up_to must be positive and strictly increasing")
+        if any(not (0 <= rate < 1) for rate in rates):
+            raise ValueError(f"tax year {year}: rates must be in [0, 1)")
+
+        lower = [0.0] + thresholds[:-1]
+        cumulative_tax = [0.0]
+        for k in range(len(thresholds) - 1):
+            cumulative_tax.append(cumulative_tax[-1] + (thresholds[k] - lower[k]) * rates[k])
+        return cls(
+            year=year,
+            thresholds=tuple(thresholds),
+            lower=tuple(lower),
+            rates=tuple(rates),
+            labels=tuple(f"{rate*100:.0f}" for rate in rates),
+            cumulative_tax=tuple(cumulative_tax),
+            net_thresholds=tuple(
+                threshold - (cumulative_tax[k] + (threshold - lower[k]) * rates[k])
+                for k, threshold in enumerate(thresholds[:-1])
+            ) + (float("inf"),),
+        )
+
+    def tax(self, income: float) -> float:
+        """Налог с дохода нарастающим итогом с начала года."""
+        if income <= 0:
+            return 0.0
+        k = bisect_left(self.thresholds, income)
+        return self.cumulative_tax[k] + (income - self.lower[k]) * self.rates[k]
+
+    def gross_for_net(self, net: float) -> float:
+        """Доход за год, после налога с которого остаётся net (обратная к income - tax(income))."""
+        if net <= 0:
+            return 0.0
+        k = bisect_left(self.net_thresholds, net)
+        net_at_lower = self.lower[k] - self.cumulative_tax[k]
+        return self.lower[k] + (net - net_at_lower) / (1 - self.rates[k])
+
+    def month_parts(self, cumulative: float, gross: float) -> List[Tuple[int, float]]:
+        """
+        (ступень, облагаемая сумма) для месяца с доходом gross, после которого
+        доход с начала года равен cumulative. Затронутые ступени идут подряд:
+        от той, где был доход на начало месяца, до той, где он на конец.
+        """
+        if cumulative <= 0 or gross <= 0:
+            return []
+        before = cumulative - gross
+        last = bisect_left(self.thresholds, cumulative)
+        first = min(bisect_right(self.thresholds, before), last)
+        parts = []
+        for k in range(first, last):
+            # первая ступень — от дохода на начало месяца, промежуточные — целиком
+            parts.append((k, self.thresholds[k] - before if k == first else self.thresholds[k] - self.lower[k]))
+        parts.append((last, min(gross, cumulative - self.lower[last])))
+        return parts
+
+
+class TaxRules:
+    """Immutable set of TaxSchedule by year, loaded once per process."""
+
+    def __init__(self, schedules: Dict[int, TaxSchedule], default_year: Optional[int] = None):
+        if not schedules:
+            raise ValueError("no tax years configured")
+        self._schedules = dict(schedules)
+        self.default_year = max(schedules) if default_year is None else default_year
+        if self.default_year not in self._schedules:
+            raise ValueError(f"default tax year {self.default_year} is not configured")
+
+    @property
+    def years(self) -> List[int]:
+        return sorted(self._schedules)
+
+    def __contains__(self, year: int) -> bool:
+        return year in self._schedules
+
+    def resolve_year(self, year: Optional[int]) -> int:
+        return self.default_year if year is None else year
+
+    def year_for(self, calendar_year: int) -> int:
+        """Шкала для календарного года: последняя заданная не позже него (для будущих лет — самая свежая)."""
+        known = [year for year in self._schedules if year <= calendar_year]
+        return max(known) if known else min(self._schedules)
+
+    def schedule(self, year: Optional[int] = None) -> TaxSchedule:
+        """Шкала года (по умолчанию — default_year); KeyError для неизвестного года."""
+        return self._schedules[self.resolve_year(year)]
+
+    @classmethod
+    def load(cls, path: Union[str, Path], default_year: Optional[int] = None) -> "TaxRules":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        schedules = {}
+        for year, brackets in data["years"].items():
+            schedules[int(year)] = TaxSchedule.compile(
+                int(year), [(bracket["up_to"], bracket["rate"]) for bracket in brackets]
+            )
+        return cls(schedules, default_year)
+
+
+tax_rules = TaxRules.load(settings.TAX_RULES_FILE or DEFAULT_RULES_FILE, settings.TAX_DEFAULT_YEAR)
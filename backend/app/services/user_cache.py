@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.config import settings
+from app.models import User
+
+
+class UserCache:
+    """
+    Bounded TTL/LRU cache of detached User snapshots keyed by username.
+
+    The cache lives in each worker process, so entries written by another
+    worker are only picked up after USER_CACHE_TTL_SECONDS. Any code path that
+    writes to a users row must call invalidate() after commit.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, username: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(username)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[username]
+                self.misses += 1
+                return None
+            self._data.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user: User) -> None:
+        if not self.enabled:
+            return
+        snapshot = _snapshot(user)
+        with self._lock:
+            self._data[user.username] = (time.monotonic() + self.ttl, snapshot)
+            self._data.move_to_end(user.username)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            if self._data.pop(username, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _snapshot(user: User) -> User:
+    """Копия строки пользователя, не привязанная ни к одной сессии."""
+    values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    snapshot = User(**values)
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+user_cache = UserCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
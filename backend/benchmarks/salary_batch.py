@@ -0,0 +1,67 @@
+"""
+Стоимость расчёта одного сценария: calculate_salary() в цикле против
+calculate_salary_batch() (NumPy, сценарии × месяцы). Перед замером
+проверяется, что результаты совпадают символ в символ.
+
+Запуск из каталога backend:
+    JWT_SECRET=... python -m benchmarks.salary_batch --scenarios 5000 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from app.salary_router import calculate_salary
+from app.schemas import SalaryRequest
+from app.services.salary_batch import calculate_salary_batch
+
+
+def scenarios(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        kpi_enabled = rng.random() < 0.6
+        items.append(SalaryRequest(
+            # от МРОТ до зарплат, пересекающих все пороги шкалы
+            salary=round(rng.choice([rng.uniform(20_000, 300_000), rng.uniform(300_000, 6_000_000)]), 2),
+            monthly_bonus=rng.choice([None, 0.0, round(rng.uniform(0, 100_000), 2)]),
+            rk_rate=rng.choice([1.0, 1.15, 1.3, 1.5, 1.7, 2.0]),
+            sn_percentage=rng.choice([0.0, 10.0, 30.0, 50.0, 80.0]),
+            kpi_enabled=kpi_enabled,
+            kpi_percentage=rng.choice([10.0, 15.0, 25.0, 40.0]) if kpi_enabled else None,
+            kpi_period=rng.choice(["quarter", "halfyear"]) if kpi_enabled else None,
+        ))
+    return items
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    items = scenarios(args.scenarios, args.seed)
+    expected = [calculate_salary(item).model_dump() for item in items]
+    actual = calculate_salary_batch(items)
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    if mismatches:
+        raise SystemExit(f"batch result differs from calculate_salary() in {mismatches} scenarios")
+
+    scalar = best_of(args.repeat, lambda: [calculate_salary(item) for item in items])
+    batch = best_of(args.repeat, lambda: calculate_salary_batch(items))
+    for name, seconds in (("calculate_salary", scalar), ("batch", batch)):
+        print(f"{name:>16}: {seconds * 1e6 / len(items):8.2f} µs/scenario  ({seconds * 1000:.1f} ms total)")
+    print(f"{'speedup':>16}: {scalar / batch:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Хит-рейт кэша /api/salary в каждом воркере против одного общего кэша.
+
+Запросы берутся из набора --distinct сценариев с распределением Zipf
+(немногие комбинации оклада/РК/СН дают большую часть трафика) и
+раздаются --workers воркерам случайно, как их разбирает gunicorn. Каждый
+воркер держит свой SalaryCache на --cache-size записей; для сравнения тот
+же поток проходит через один общий кэш того же размера. Дополнительно
+замеряется цена промаха (расчёт и сериализация ответа), попадания и
+чтения по ключу из SQLite-таблицы — нижняя граница для общего кэша в БД.
+
+Запуск из каталога backend:
+    JWT_SECRET=... python -m benchmarks.salary_cache_workers --workers 4 --requests 200000
+"""
+import argparse
+import bisect
+import itertools
+import random
+import sqlite3
+import time
+
+from app.salary_router import calculate_salary
+from app.schemas import SalaryRequest
+from app.services.salary_cache import SalaryCache, cache_key, normalize_request
+
+
+def scenarios(count: int, rng: random.Random) -> list:
+    items = []
+    for _ in range(count):
+        kpi_enabled = rng.random() < 0.5
+        items.append(normalize_request(SalaryRequest(
+            # оклады круглые, как их вводят в форму
+            salary=rng.randrange(30, 600) * 1000.0,
+            monthly_bonus=rng.choice([None, 5000.0, 10_000.0]),
+            rk_rate=rng.choice([1.0, 1.15, 1.3, 1.5, 1.7, 2.0]),
+            sn_percentage=rng.choice([0.0, 10.0, 30.0, 50.0, 80.0]),
+            kpi_enabled=kpi_enabled,
+            kpi_percentage=rng.choice([10.0, 20.0, 25.0]) if kpi_enabled else None,
+            kpi_period=rng.choice(["quarter", "halfyear"]) if kpi_enabled else None,
+        )))
+    return items
+
+
+def zipf_stream(count: int, distinct: int, exponent: float, rng: random.Random) -> list:
+    weights = [1 / (rank ** exponent) for rank in range(1, distinct + 1)]
+    cumulative = list(itertools.accumulate(weights))
+    return [bisect.bisect(cumulative, rng.random() * cumulative[-1]) for _ in range(count)]
+
+
+def hit_rate(caches: list, stream: list, keys: list, rng: random.Random) -> float:
+    for cache in caches:
+        cache.clear()
+        cache.hits = cache.misses = cache.evictions = 0
+    for index in stream:
+        cache = caches[rng.randrange(len(caches))]
+        if cache.get(keys[index]) is None:
+            cache.put(keys[index], b"-")
+    hits = sum(cache.hits for cache in caches)
+    return hits / (hits + sum(cache.misses for cache in caches))
+
+
+def per_call(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=50_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--cache-size", type=int, default=4096)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = scenarios(args.distinct, rng)
+    keys = [cache_key(item) + ("formatted",) for item in items]
+    stream = zipf_stream(args.requests, args.distinct, args.zipf, rng)
+
+    shared = hit_rate([SalaryCache(args.cache_size)], stream, keys, random.Random(args.seed))
+    per_worker = hit_rate(
+        [SalaryCache(args.cache_size) for _ in range(args.workers)], stream, keys, random.Random(args.seed)
+    )
+    print(f"{args.requests} requests over {args.distinct} scenarios (zipf {args.zipf}), cache size {args.cache_size}")
+    print(f"{'shared cache':>24}: {shared:6.1%} hit rate")
+    print(f"{f'{args.workers} per-worker caches':>24}: {per_worker:6.1%} hit rate")
+
+    cache = SalaryCache(args.cache_size)
+    body = calculate_salary(items[0]).model_dump_json().encode("utf-8")
+    cache.put(keys[0], body)
+    miss = per_call(lambda: calculate_salary(items[0]).model_dump_json().encode("utf-8"), 500)
+    hit = per_call(lambda: cache.get(keys[0]), 50_000)
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE salary_cache (key TEXT PRIMARY KEY, body BLOB)")
+    connection.execute("INSERT INTO salary_cache VALUES (?, ?)", (repr(keys[0]), body))
+    lookup = per_call(
+        lambda: connection.execute("SELECT body FROM salary_cache WHERE key = ?", (repr(keys[0]),)).fetchone(), 50_000
+    )
+    print(f"{'miss (compute)':>24}: {miss * 1e6:8.1f} µs")
+    print(f"{'hit (per-worker LRU)':>24}: {hit * 1e6:8.1f} µs")
+    print(f"{'in-process SQLite lookup':>24}: {lookup * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Время старта API-воркера: импорт app.main и время до первого ответа.
+
+Запускает uvicorn в отдельном процессе и опрашивает /health, пока не придёт
+первый 200; отдельно меряет импорт приложения в чистом интерпретаторе.
+
+Запуск из каталога backend:
+    python -m benchmarks.startup_time --runs 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t); "
+    "import sys; print(int('openai' in sys.modules))"
+)
+
+
+def measure_import() -> tuple:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], check=True, capture_output=True, text=True
+    ).stdout.split()
+    return float(output[0]), output[1] == "1"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_request(timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("server did not answer /health in time")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    imports, first_requests = [], []
+    openai_loaded = False
+    for _ in range(args.runs):
+        seconds, openai_loaded = measure_import()
+        imports.append(seconds)
+        first_requests.append(measure_first_request())
+    print(f"import app.main:        median {statistics.median(imports) * 1000:7.1f} ms (openai imported: {openai_loaded})")
+    print(f"process start -> 200:   median {statistics.median(first_requests) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
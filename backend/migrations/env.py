@@ -0,0 +1,60 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.config import settings
+from app.database import Base
+import app.models  # noqa: F401  регистрирует таблицы в Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # FTS5-таблица поиска по истории в SQLite и её служебные таблицы создаются миграцией, а не моделями
+    if type_ == "table" and reflected and name.startswith(app.models.SQLITE_FTS_TABLE):
+        return False
+    # autogenerate не учитывает Index.ddl_if(dialect=...): такие индексы есть только в своей СУБД
+    ddl_if = getattr(object, "_ddl_if", None)
+    if type_ == "index" and ddl_if is not None and ddl_if.dialect not in (None, context.get_bind().dialect.name):
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # соединение можно передать через Config.attributes (так миграции гоняют тесты)
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+    connectable = create_engine(settings.DATABASE_URL, poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        _run_migrations(connection)
+
+
+def _run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,63 @@
+"""initial schema
+
+Схема, которую раньше создавал Base.metadata.create_all. В базе, созданной
+через create_all, таблицы уже есть, поэтому миграция создаёт только
+недостающие и `alembic upgrade head` работает и без `alembic stamp`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("subscription_type", sa.String(), nullable=False),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if not inspector.has_table("subscription_types"):
+        op.create_table(
+            "subscription_types",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("name", sa.String(), nullable=False, unique=True),
+            sa.Column("max_history_entries", sa.Integer(), nullable=False),
+        )
+
+    if not inspector.has_table("user_history"):
+        op.create_table(
+            "user_history",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("module_name", sa.String(), nullable=False),
+            sa.Column("query", sa.Text(), nullable=False),
+            sa.Column("response", sa.Text(), nullable=False),
+            sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("user_history")
+    op.drop_table("subscription_types")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_index("ix_users_username", table_name="users")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_table("users")
@@ -0,0 +1,40 @@
+"""users.token_version and user_sessions
+
+Колонка и таблица могли уже появиться через create_all до перехода на
+Alembic, поэтому миграция проверяет их наличие.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if "token_version" not in {c["name"] for c in inspector.get_columns("users")}:
+        op.add_column("users", sa.Column("token_version", sa.Integer(), server_default="0", nullable=False))
+
+    if not inspector.has_table("user_sessions"):
+        op.create_table(
+            "user_sessions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+            sa.Column("token_hash", sa.String(64), nullable=False, unique=True),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+        op.create_index("ix_user_sessions_user_id", "user_sessions", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_sessions_user_id", table_name="user_sessions")
+    op.drop_table("user_sessions")
+    op.drop_column("users", "token_version")
@@ -0,0 +1,36 @@
+"""composite (user_id, module_name, timestamp DESC) index on user_history
+
+Покрывает выборку истории, подсчёт записей модуля и поиск самых старых
+записей при очистке по лимиту. В Postgres индекс строится CONCURRENTLY,
+чтобы не блокировать запись в таблицу.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_user_history_user_module_ts"
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            "user_history",
+            ["user_id", "module_name", sa.text("timestamp DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name="user_history", postgresql_concurrently=True, if_exists=True)
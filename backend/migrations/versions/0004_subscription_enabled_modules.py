@@ -0,0 +1,25 @@
+"""subscription_types.enabled_modules
+
+Список модулей тарифа для entitlements; NULL означает набор по умолчанию
+(для free — все модули, кроме summary).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("subscription_types", sa.Column("enabled_modules", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("subscription_types", "enabled_modules")
@@ -0,0 +1,28 @@
+"""user_history.query_preview
+
+Короткое превью query для постраничного списка истории: список читает только
+его и не трогает большие колонки query/response. Существующие строки
+заполняются одним UPDATE.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("user_history", sa.Column("query_preview", sa.String(200), nullable=True))
+    user_history = sa.table("user_history", sa.column("query", sa.Text), sa.column("query_preview", sa.String))
+    op.execute(user_history.update().values(query_preview=sa.func.substr(user_history.c.query, 1, 200)))
+
+
+def downgrade() -> None:
+    op.drop_column("user_history", "query_preview")
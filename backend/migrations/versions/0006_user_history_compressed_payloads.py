@@ -0,0 +1,69 @@
+"""user_history.query/response as compressed bytes
+
+Колонки становятся bytea/BLOB; новые записи пишутся через
+app.services.history_codec (zlib со словарём). Существующие строки
+переводятся в UTF-8 байты без сжатия и читаются кодеком как есть.
+В Postgres отключаем повторное сжатие TOAST для уже сжатых значений.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.history_codec import MARKER, decompress
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+COLUMNS = ("query", "response")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("user_history") as batch:
+        for column in COLUMNS:
+            batch.alter_column(
+                column,
+                existing_type=sa.Text(),
+                type_=sa.LargeBinary(),
+                existing_nullable=False,
+                postgresql_using=f"convert_to({column}, 'UTF8')",
+            )
+    if op.get_bind().dialect.name == "postgresql":
+        for column in COLUMNS:
+            op.execute(f"ALTER TABLE user_history ALTER COLUMN {column} SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    # Сжатые строки распаковываем в Python: convert_from ожидает чистый UTF-8
+    bind = op.get_bind()
+    user_history = sa.table(
+        "user_history",
+        sa.column("id", sa.Integer),
+        *(sa.column(column, sa.LargeBinary) for column in COLUMNS),
+    )
+    for column in COLUMNS:
+        rows = bind.execute(sa.select(user_history.c.id, user_history.c[column])).all()
+        for row_id, value in rows:
+            if isinstance(value, (bytes, memoryview)) and bytes(value).startswith(MARKER):
+                bind.execute(
+                    user_history.update()
+                    .where(user_history.c.id == row_id)
+                    .values({column: decompress(value).encode("utf-8")})
+                )
+    if bind.dialect.name == "postgresql":
+        for column in COLUMNS:
+            op.execute(f"ALTER TABLE user_history ALTER COLUMN {column} SET STORAGE EXTENDED")
+    with op.batch_alter_table("user_history") as batch:
+        for column in COLUMNS:
+            batch.alter_column(
+                column,
+                existing_type=sa.LargeBinary(),
+                type_=sa.Text(),
+                existing_nullable=False,
+                postgresql_using=f"convert_from({column}, 'UTF8')",
+            )
@@ -0,0 +1,96 @@
+"""user_history.content_hash + unique (user_id, module_name, content_hash)
+
+Повторное сохранение той же пары query/response обновляет timestamp
+существующей записи вместо новой строки. Хэш считается по исходному
+тексту, поэтому существующие строки заполняются в Python (payload может
+быть сжат); из уже накопленных дублей остаётся самая новая запись.
+Уникальный индекс в Postgres строится CONCURRENTLY.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.history_codec import content_hash, decompress
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "uq_user_history_content"
+BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    op.add_column("user_history", sa.Column("content_hash", sa.String(64), nullable=True))
+
+    bind = op.get_bind()
+    user_history = sa.table(
+        "user_history",
+        sa.column("id", sa.Integer),
+        sa.column("user_id", sa.Integer),
+        sa.column("module_name", sa.String),
+        sa.column("timestamp", sa.DateTime),
+        sa.column("query", sa.LargeBinary),
+        sa.column("response", sa.LargeBinary),
+        sa.column("content_hash", sa.String),
+    )
+    # Внутри (user_id, module_name) новые записи идут первыми: первая копия остаётся, остальные удаляются
+    rows = bind.execute(
+        sa.select(
+            user_history.c.id, user_history.c.user_id, user_history.c.module_name,
+            user_history.c.query, user_history.c.response,
+        )
+        .order_by(
+            user_history.c.user_id, user_history.c.module_name,
+            user_history.c.timestamp.desc(), user_history.c.id.desc(),
+        )
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    group, seen = None, set()
+    hashes, duplicates = [], []
+    for row_id, user_id, module_name, query, response in rows:
+        if (user_id, module_name) != group:
+            group, seen = (user_id, module_name), set()
+        digest = content_hash(decompress(query), decompress(response))
+        if digest in seen:
+            duplicates.append(row_id)
+        else:
+            seen.add(digest)
+            hashes.append({"row_id": row_id, "digest": digest})
+        if len(hashes) + len(duplicates) >= BATCH_SIZE:
+            _apply(bind, user_history, hashes, duplicates)
+            hashes, duplicates = [], []
+    _apply(bind, user_history, hashes, duplicates)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            "user_history",
+            ["user_id", "module_name", "content_hash"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def _apply(bind, user_history, hashes, duplicates) -> None:
+    if duplicates:
+        bind.execute(user_history.delete().where(user_history.c.id.in_(duplicates)))
+    if hashes:
+        bind.execute(
+            user_history.update()
+            .where(user_history.c.id == sa.bindparam("row_id"))
+            .values(content_hash=sa.bindparam("digest")),
+            hashes,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name="user_history", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("user_history", "content_hash")
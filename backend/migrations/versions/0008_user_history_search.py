@@ -0,0 +1,103 @@
+"""full-text search over user_history
+
+Postgres: колонка search_vector (tsvector, russian + english; query с весом A,
+response с весом B) и GIN-индекс, построенный CONCURRENTLY. Текст хранится
+сжатым, поэтому вектор считается из распакованного текста в Python и
+передаётся в to_tsvector параметром — так же, как при вставке.
+SQLite: FTS5-таблица user_history_fts и триггер удаления; колонка
+search_vector создаётся пустой, чтобы схема совпадала с моделью.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.services.history_codec import decompress
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_user_history_search"
+FTS_TABLE = "user_history_fts"
+BATCH_SIZE = 500
+
+
+def _vector_sql() -> str:
+    parts = [
+        f"setweight(to_tsvector('{config}', :{field}), '{weight}')"
+        for field, weight in (("query", "A"), ("response", "B"))
+        for config in ("russian", "english")
+    ]
+    return " || ".join(parts)
+
+
+def _payloads(bind):
+    user_history = sa.table(
+        "user_history",
+        sa.column("id", sa.Integer),
+        sa.column("query", sa.LargeBinary),
+        sa.column("response", sa.LargeBinary),
+    )
+    rows = bind.execute(
+        sa.select(user_history.c.id, user_history.c.query, user_history.c.response)
+        .order_by(user_history.c.id)
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    batch = []
+    for row_id, query, response in rows:
+        batch.append({"row_id": row_id, "query": decompress(query), "response": decompress(response)})
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.add_column("user_history", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+        update = sa.text(f"UPDATE user_history SET search_vector = {_vector_sql()} WHERE id = :row_id")
+        for batch in _payloads(bind):
+            bind.execute(update, batch)
+        with op.get_context().autocommit_block():
+            op.create_index(
+                INDEX_NAME,
+                "user_history",
+                ["search_vector"],
+                postgresql_using="gin",
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+        return
+
+    op.add_column("user_history", sa.Column("search_vector", sa.Text(), nullable=True))
+    if bind.dialect.name == "sqlite":
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(query, response, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON user_history "
+            f"BEGIN DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END"
+        )
+        insert = sa.text(f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, query, response) VALUES (:row_id, :query, :response)")
+        for batch in _payloads(bind):
+            bind.execute(insert, batch)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.drop_index(INDEX_NAME, table_name="user_history", postgresql_concurrently=True, if_exists=True)
+    elif bind.dialect.name == "sqlite":
+        op.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete")
+        op.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    op.drop_column("user_history", "search_vector")
@@ -0,0 +1,41 @@
+"""user_history.client_id + unique (user_id, client_id)
+
+Записи, принятые через буфер (HISTORY_WRITE_MODE=behind), получают id ещё
+до сохранения: он возвращается в ответе 202 и сохраняется вместе со строкой,
+поэтому запись потом находится через GET /history/client/{client_id}.
+Старые строки остаются с NULL. Уникальный индекс в Postgres строится
+CONCURRENTLY.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "uq_user_history_client_id"
+
+
+def upgrade() -> None:
+    op.add_column("user_history", sa.Column("client_id", sa.String(32), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            "user_history",
+            ["user_id", "client_id"],
+            unique=True,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name="user_history", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("user_history", "client_id")
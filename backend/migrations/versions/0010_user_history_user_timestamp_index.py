@@ -0,0 +1,38 @@
+"""user_history index (user_id, timestamp DESC, id DESC)
+
+Лента истории по всем модулям (GET /history без module_name и страницы
+/history/summaries) сортирует по (timestamp, id) внутри пользователя.
+Индекс по (user_id, module_name, timestamp) такой порядок не даёт, и
+строки пользователя сортировались в памяти. Индекс в Postgres строится
+CONCURRENTLY.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "ix_user_history_user_ts"
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            INDEX_NAME,
+            "user_history",
+            ["user_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(INDEX_NAME, table_name="user_history", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+# Settings требует DATABASE_URL и JWT_SECRET при импорте app.*; для тестов хватает SQLite во временном каталоге
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.mkdtemp()) / 'test.db'}")
+os.environ.setdefault("JWT_SECRET", "test-secret-0123456789abcdef0123456789")
+os.environ.setdefault("PASSWORD_POOL_WORKERS", "0")
+os.environ.setdefault("DB_SCHEMA_MODE", "create_all")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def user():
+    """Пользователь в тестовой БД (схема создаётся на startup приложения)."""
+    from app.database import Base, SessionLocal, engine
+    from app.models import User
+
+    Base.metadata.create_all(bind=engine)
+    name = f"user-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        user = User(username=name, email=f"{name}@example.com", hashed_password="-", subscription_type="free")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+    return user
+
+
+@pytest.fixture
+def auth_headers(user):
+    from app.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token(user, expires_minutes=5)}"}
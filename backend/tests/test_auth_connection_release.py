@@ -0,0 +1,76 @@
+"""
+Запрос с долгим вызовом LLM не должен держать соединение из пула.
+
+POST /api/job_generator аутентифицируется через get_current_user (кэш
+пользователей выключен, так что каждый запрос ищет пользователя в БД) и
+потом ждёт ответ модели. Пул — одно соединение без overflow: если
+соединение не возвращается после аутентификации, параллельные запросы
+упираются в QueuePool timeout.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+import app.job_generator_router as job_generator
+from app.database import LazySessionLocal, SessionLocal, engine
+from app.main import app
+from app.services.user_cache import user_cache
+
+REQUESTS = 8
+LLM_SECONDS = 0.5
+
+
+class SlowResponses:
+    """Заглушка client.responses: спит как долгий вызов модели и замеряет пул на середине."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.checked_out = []
+
+    def create(self, **kwargs):
+        time.sleep(LLM_SECONDS / 2)
+        # к этому моменту все параллельные запросы уже прошли аутентификацию
+        self.checked_out.append(self.pool.checkedout())
+        time.sleep(LLM_SECONDS / 2)
+        return SimpleNamespace(output_text="ok")
+
+
+@pytest.fixture
+def single_connection_engine(monkeypatch):
+    small = create_engine(
+        engine.url,
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=2,
+        connect_args={"check_same_thread": False},
+    )
+    for factory in (SessionLocal, LazySessionLocal):
+        monkeypatch.setitem(factory.kw, "bind", small)
+    yield small
+    small.dispose()
+
+
+def test_llm_call_does_not_hold_a_connection(monkeypatch, single_connection_engine, auth_headers):
+    responses = SlowResponses(single_connection_engine.pool)
+    monkeypatch.setattr(job_generator, "YANDEX_CLOUD_API_KEY", "test")
+    monkeypatch.setattr(job_generator, "YANDEX_CLOUD_FOLDER", "test")
+    monkeypatch.setattr(job_generator, "get_yandex_client", lambda: SimpleNamespace(responses=responses))
+    monkeypatch.setattr(user_cache, "get", lambda username: None)
+
+    body = {"job_title": "Developer", "company": "Test", "tasks": "-", "requirements": "-", "conditions": "-"}
+    with TestClient(app, raise_server_exceptions=False) as client:
+        with ThreadPoolExecutor(REQUESTS) as executor:
+            results = list(executor.map(
+                lambda _: client.post("/api/job_generator", json=body, headers=auth_headers), range(REQUESTS),
+            ))
+
+    assert [r.status_code for r in results] == [200] * REQUESTS, [r.text[:200] for r in results if r.status_code != 200]
+    assert all(r.json()["result"] == "ok" for r in results)
+    assert responses.checked_out == [0] * REQUESTS
+    assert single_connection_engine.pool.checkedout() == 0
@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException
+
+from app.auth import create_access_token, get_current_principal
+from app.database import SessionLocal
+from app.models import User
+from app.services.user_cache import user_cache
+
+
+def bump_token_version(user_id: int) -> None:
+    # так revoke_all_sessions() отзывает токены — возможно, на другом воркере
+    with SessionLocal() as db:
+        db.get(User, user_id).token_version += 1
+        db.commit()
+
+
+def test_principal_from_token(user):
+    user_cache.clear()
+    principal = get_current_principal(create_access_token(user, expires_minutes=5))
+    assert (principal.id, principal.username, principal.subscription_type) == (user.id, user.username, "free")
+
+
+def test_token_revoked_on_another_worker_is_rejected(user):
+    token = create_access_token(user, expires_minutes=5)
+    bump_token_version(user.id)
+    # у этого воркера пользователя в кэше нет: версия берётся из БД
+    user_cache.clear()
+    with pytest.raises(HTTPException) as error:
+        get_current_principal(token)
+    assert error.value.status_code == 401
+
+
+def test_token_of_deleted_user_is_rejected(user):
+    token = create_access_token(user, expires_minutes=5)
+    with SessionLocal() as db:
+        db.delete(db.get(User, user.id))
+        db.commit()
+    user_cache.clear()
+    with pytest.raises(HTTPException):
+        get_current_principal(token)
@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.history_codec import MARKER, MIN_COMPRESS_BYTES, compress, decompress
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "обычный запрос",
+    # текст, начинающийся с NUL и байта, похожего на номер формата
+    "\u0000\u0005abc",
+    "\u0000\u0001abc",
+    "\u0000\u0000",
+    "\u0000",
+    "\u0000\u0001" + "x" * MIN_COMPRESS_BYTES,
+    '{"salary":100000,"rk_rate":1}' * 20,
+])
+@pytest.mark.parametrize("level", [0, 6])
+def test_round_trip(text, level):
+    assert decompress(compress(text, level)) == text
+
+
+def test_plain_text_is_stored_as_utf8():
+    assert compress("short", 6) == b"short"
+    assert compress("\u0000\u0005abc", 0).startswith(MARKER)
+
+
+def test_rows_written_before_compression_are_read_as_is():
+    assert decompress(b"plain text") == "plain text"
+    assert decompress("plain text") == "plain text"
@@ -0,0 +1,81 @@
+"""
+Регрессионная проверка планов запросов к user_history.
+
+Временная SQLite-база поднимается миграциями (alembic upgrade head), после
+чего для каждого запроса history_router и history_store (списки, страницы
+/history/summaries, очистка по лимиту, обновление повторных сохранений)
+берётся EXPLAIN QUERY PLAN: таблица должна читаться через свой индекс, а
+упорядоченные выборки — не сортироваться во временном B-дереве.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, desc, select, text
+
+from app.models import UserHistory
+from app.schema_version import BACKEND_DIR
+from app.services.history_store import _touch, before_cursor, retention_delete, retention_delete_many
+
+MODULE_INDEX = "ix_user_history_user_module_ts"
+USER_INDEX = "ix_user_history_user_ts"
+CONTENT_INDEX = "uq_user_history_content"
+
+
+def history_queries():
+    """Запрос -> (индекс, через который он должен читать user_history; упорядочен ли результат)."""
+    by_module = (UserHistory.user_id == 1, UserHistory.module_name == "calculator")
+    newest_first = (desc(UserHistory.timestamp), desc(UserHistory.id))
+    summary_columns = (UserHistory.id, UserHistory.module_name, UserHistory.query_preview, UserHistory.timestamp)
+    cursor = before_cursor(datetime(2026, 1, 1, 12, 0, 0, 500000, tzinfo=timezone.utc), 1000)
+    return {
+        "list by module": (select(UserHistory).where(*by_module).order_by(*newest_first).limit(50), MODULE_INDEX, True),
+        "list all modules": (
+            select(UserHistory).where(UserHistory.user_id == 1).order_by(*newest_first).limit(50), USER_INDEX, True,
+        ),
+        "summaries page by module": (
+            select(*summary_columns).where(*by_module, cursor).order_by(*newest_first).limit(51), MODULE_INDEX, True,
+        ),
+        "summaries page all modules": (
+            select(*summary_columns).where(UserHistory.user_id == 1, cursor).order_by(*newest_first).limit(51),
+            USER_INDEX,
+            True,
+        ),
+        "retention delete": (retention_delete(1, "calculator", 50), MODULE_INDEX, False),
+        "retention delete, batch": (retention_delete_many(1, {"calculator": 2, "salary": 1}, 50), MODULE_INDEX, False),
+        "dedup bump": (
+            _touch(1, UserHistory.module_name == "calculator", UserHistory.content_hash == "0" * 64),
+            CONTENT_INDEX,
+            False,
+        ),
+    }
+
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'history.db'}")
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+        connection.commit()
+    with engine.connect() as connection:
+        yield connection
+    engine.dispose()
+
+
+def explain(connection, statement) -> str:
+    sql = str(statement.compile(connection, compile_kwargs={"literal_binds": True}))
+    return "\n".join(row[-1] for row in connection.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+
+@pytest.mark.parametrize("name", list(history_queries()))
+def test_history_query_uses_index(migrated, name):
+    statement, index_name, ordered = history_queries()[name]
+    plan = explain(migrated, statement)
+    assert f"INDEX {index_name}" in plan, plan
+    assert "SCAN user_history\n" not in plan + "\n", plan
+    if ordered:
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+from app.services.history_queue import history_queue
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "HISTORY_WRITE_MODE", "behind")
+    # фоновый flush не должен успеть раньше теста
+    monkeypatch.setattr(history_queue, "interval", 60)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_queued_entry_resolves_by_client_id(client, auth_headers):
+    payload = {"module_name": "salary", "query": '{"salary": 100000}', "response": '{"net": 87000}'}
+    accepted = client.post("/api/history", json=payload, headers=auth_headers)
+    assert accepted.status_code == 202
+    client_id = accepted.json()["client_id"]
+
+    # до записи из буфера записи ещё нет
+    assert client.get(f"/api/history/client/{client_id}", headers=auth_headers).status_code == 404
+
+    client.portal.call(history_queue.flush)
+
+    resolved = client.get(f"/api/history/client/{client_id}", headers=auth_headers)
+    assert resolved.status_code == 200
+    item = resolved.json()
+    assert (item["module_name"], item["query"], item["response"]) == (
+        payload["module_name"], payload["query"], payload["response"],
+    )
+    assert item["timestamp"].startswith(accepted.json()["timestamp"][:19])
+
+    by_id = client.get(f"/api/history/{item['id']}", headers=auth_headers)
+    assert by_id.status_code == 200
+    assert by_id.json() == item
+
+
+def test_client_id_is_scoped_to_user(client, auth_headers):
+    payload = {"module_name": "salary", "query": "q", "response": "r"}
+    client_id = client.post("/api/history", json=payload, headers=auth_headers).json()["client_id"]
+    client.portal.call(history_queue.flush)
+
+    assert client.get(f"/api/history/client/{client_id}").status_code == 401
+    assert client.get(f"/api/history/client/{client_id[::-1]}", headers=auth_headers).status_code == 404
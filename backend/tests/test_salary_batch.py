@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from app.salary_router import calculate_salary, compute_salary, raw_salary
+from app.schemas import SalaryRequest
+from app.services.salary_batch import calculate_salary_batch
+from app.services.tax_rules import tax_rules
+
+SCENARIOS = 300
+
+
+def scenarios(count: int, seed: int, tax_year) -> list:
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        kpi_enabled = rng.random() < 0.6
+        items.append(SalaryRequest(
+            # от МРОТ до зарплат, пересекающих все пороги шкалы
+            salary=round(rng.choice([rng.uniform(20_000, 300_000), rng.uniform(300_000, 6_000_000)]), 2),
+            monthly_bonus=rng.choice([None, 0.0, round(rng.uniform(0, 100_000), 2)]),
+            rk_rate=rng.choice([1.0, 1.15, 1.3, 1.5, 1.7, 2.0]),
+            sn_percentage=rng.choice([0.0, 10.0, 30.0, 50.0, 80.0]),
+            kpi_enabled=kpi_enabled,
+            # проценты KPI бывают и невалидными для сценария: включён без процента или с процентом, но выключен
+            kpi_percentage=rng.choice([None, 10.0, 15.0, 25.0, 40.0, round(rng.uniform(0, 100), 4)]),
+            kpi_period=rng.choice([None, "quarter", "halfyear"]),
+            tax_year=tax_year,
+        ))
+    return items
+
+
+def assert_same_fields(expected, actual, path="response"):
+    """Сравнение поле за полем, чтобы при расхождении было видно, какое именно поле."""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and actual.keys() == expected.keys(), path
+        for key in expected:
+            assert_same_fields(expected[key], actual[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert isinstance(actual, list) and len(actual) == len(expected), path
+        for index, (left, right) in enumerate(zip(expected, actual)):
+            assert_same_fields(left, right, f"{path}[{index}]")
+    else:
+        assert actual == expected, path
+
+
+@pytest.mark.parametrize("tax_year", [None, *tax_rules.years])
+@pytest.mark.parametrize("output", ["formatted", "raw"])
+def test_batch_matches_scalar(tax_year, output):
+    items = scenarios(SCENARIOS, seed=tax_year or 0, tax_year=tax_year)
+    actual = calculate_salary_batch(items, raw=output == "raw")
+    assert len(actual) == len(items)
+    for index, (item, result) in enumerate(zip(items, actual)):
+        if output == "raw":
+            expected = raw_salary(compute_salary(item))
+        else:
+            expected = calculate_salary(item).model_dump()
+        assert_same_fields(expected, result, f"scenario {index}")
+
+
+def test_batch_mixes_tax_years():
+    # сценарии разных лет в одной пачке считаются каждый по своей шкале
+    items = [item for year in tax_rules.years for item in scenarios(20, seed=year, tax_year=year)]
+    random.Random(7).shuffle(items)
+    for item, result in zip(items, calculate_salary_batch(items, raw=True)):
+        assert_same_fields(raw_salary(compute_salary(item)), result)
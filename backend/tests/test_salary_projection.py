@@ -0,0 +1,75 @@
+import pytest
+
+import app.services.salary_projection as salary_projection
+from app.services.salary_projection import MonthState, ProjectionBase, SalaryProjection
+
+BASE = ProjectionBase(
+    salary=150_000.0,
+    monthly_bonus=10_000.0,
+    rk_rate=1.3,
+    sn_percentage=30.0,
+    kpi_percentage=20.0,
+    kpi_period="quarter",
+    start_year=2024,
+    years=2,
+)
+EVENTS = [
+    (2, "raise", 10.0, 0),
+    (5, "unpaid_leave", 0.5, 2),
+    (6, "indexation", 5.0, 0),
+    (16, "sn", 50.0, 0),
+    (20, "rk", 1.5, 0),
+]
+
+
+@pytest.fixture
+def recomputed(monkeypatch):
+    """Все MonthState, посчитанные за тест: по одному на пересчитанный месяц."""
+    states = []
+
+    def counting_state(**fields):
+        states.append(MonthState(**fields))
+        return states[-1]
+
+    monkeypatch.setattr(salary_projection, "MonthState", counting_state)
+    return states
+
+
+@pytest.mark.parametrize("events, first_changed", [
+    # изменилось одно событие на 17-м месяце: пересчитываются 8 из 24
+    ([*EVENTS[:3], (16, "sn", 80.0, 0), EVENTS[4]], 16),
+    # новое событие во втором году
+    ([*EVENTS, (13, "raise", 3.0, 0)], 13),
+    # убрали событие
+    ([*EVENTS[:4]], 20),
+    # отпуск стал длиннее: пересчёт с месяца самого события, а не с конца старого отпуска
+    ([*EVENTS[:1], (5, "unpaid_leave", 0.5, 4), *EVENTS[2:]], 5),
+    # индексация повторяется через год — всё равно считается от месяца события
+    ([*EVENTS[:2], (6, "indexation", 7.0, 0), *EVENTS[3:]], 6),
+])
+def test_incremental_projection_matches_full_build(recomputed, events, first_changed):
+    projection = SalaryProjection.build(BASE, EVENTS)
+    recomputed.clear()
+
+    updated, start = projection.with_events(events)
+
+    assert start == first_changed
+    assert len(recomputed) == projection.months - first_changed
+    assert recomputed == updated.states[start:]
+    # месяцы до первого изменения переиспользуются без пересчёта
+    assert all(a is b for a, b in zip(updated.states[:start], projection.states[:start]))
+    fresh = SalaryProjection.build(BASE, events)
+    assert len(updated.states) == len(fresh.states) == 24
+    for month, (incremental, full) in enumerate(zip(updated.states, fresh.states)):
+        assert incremental == full, f"month {month}"
+
+
+def test_unchanged_events_recompute_nothing(recomputed):
+    projection = SalaryProjection.build(BASE, EVENTS)
+    recomputed.clear()
+
+    updated, start = projection.with_events(list(reversed(EVENTS)))
+
+    assert start == projection.months
+    assert recomputed == []
+    assert updated.states == projection.states
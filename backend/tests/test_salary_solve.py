@@ -0,0 +1,24 @@
+import pytest
+
+from app.salary_router import compute_salary, solve_salary_endpoint
+from app.schemas import SalaryRequest, SalarySolveRequest
+from app.services.salary_cache import normalize_request
+
+
+@pytest.mark.parametrize("target_net, parameters", [
+    # проценты, которые normalize_request() округляет до 4 знаков
+    (300_000.0, dict(rk_rate=1.0, sn_percentage=0.0, kpi_enabled=True, kpi_percentage=100 / 3, kpi_period="quarter")),
+    (123_456.78, dict(rk_rate=1.15, sn_percentage=200 / 3, kpi_enabled=True, kpi_percentage=100 / 7, kpi_period="halfyear")),
+    (5_000_000.0, dict(rk_rate=1.7 + 1e-5, sn_percentage=50.0, kpi_enabled=False, monthly_bonus=10_000.005)),
+])
+def test_solved_salary_reaches_target(target_net, parameters):
+    response = solve_salary_endpoint(SalarySolveRequest(target_net=target_net, **parameters), current_user=None)
+
+    def yearly_net(salary):
+        return compute_salary(normalize_request(SalaryRequest(salary=salary, **parameters))).yearly_net
+
+    # разбивка в ответе посчитана по тому же окладу и даёт не меньше цели...
+    assert yearly_net(response.salary) >= target_net * 12 - 1e-6
+    assert response.annual_net_income >= round(target_net * 12, 2)
+    # ...а оклад на копейку меньше — уже нет
+    assert yearly_net(response.salary - 0.01) < target_net * 12
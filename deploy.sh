@@ -36,6 +36,10 @@ docker-compose build web
 echo "🔨 Building backend..."
 docker-compose build api
 
+# Apply database migrations (API workers only verify the schema revision on boot)
+echo "🗄️  Applying database migrations..."
+docker-compose run --rm api alembic upgrade head
+
 # Start services
 echo "🚀 Starting services..."
 if [ "$ENV" = "production" ]; then
@@ -1,14 +1,18 @@
 // src/api/client.ts
-import axios, { AxiosError } from "axios";
+import axios, { AxiosError, InternalAxiosRequestConfig } from "axios";
 import { isTokenExpired } from "../utils/jwt";
 
 export const api = axios.create({
   baseURL: import.meta.env.VITE_API_BASE_URL || "/api"
 });
 
+// Auth endpoints (/login, /token/refresh) live at root level
+const AUTH_BASE = import.meta.env.VITE_API_BASE_URL || "";
+
 // Helper function to clear auth and redirect to login
 function clearAuthAndRedirect() {
   localStorage.removeItem("access_token");
+  localStorage.removeItem("refresh_token");
   delete api.defaults.headers.common["Authorization"];
   // Only redirect if we're not already on login/register page
   if (!window.location.pathname.includes("/login") && !window.location.pathname.includes("/register")) {
@@ -16,25 +20,57 @@ function clearAuthAndRedirect() {
   }
 }
 
+// Single in-flight refresh shared by all requests that hit an expired token
+let refreshPromise: Promise<string | null> | null = null;
+
+// Exchange the stored refresh token for a new access token (no password/bcrypt round trip)
+export function refreshAccessToken(): Promise<string | null> {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) {
+    return Promise.resolve(null);
+  }
+  if (!refreshPromise) {
+    refreshPromise = axios
+      .post(`${AUTH_BASE}/token/refresh`, { refresh_token: refreshToken })
+      .then((res) => {
+        const token = res.data.access_token as string;
+        localStorage.setItem("access_token", token);
+        localStorage.setItem("refresh_token", res.data.refresh_token as string);
+        api.defaults.headers.common["Authorization"] = `Bearer ${token}`;
+        return token;
+      })
+      .catch(() => null)
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+}
+
 // Initialize auth token from localStorage on startup
 const initialToken = localStorage.getItem("access_token");
 if (initialToken) {
-  // Check if token is expired before using it
+  // Check if token is expired before using it; an expired token is refreshed on the first request
   if (isTokenExpired(initialToken)) {
-    clearAuthAndRedirect();
+    if (!localStorage.getItem("refresh_token")) {
+      clearAuthAndRedirect();
+    }
   } else {
     api.defaults.headers.common["Authorization"] = `Bearer ${initialToken}`;
   }
 }
 
 // Add request interceptor to always use the latest token from localStorage
-api.interceptors.request.use((config) => {
-  const token = localStorage.getItem("access_token");
+api.interceptors.request.use(async (config) => {
+  let token = localStorage.getItem("access_token");
   if (token) {
     // Check token expiration before each request
     if (isTokenExpired(token)) {
-      clearAuthAndRedirect();
-      return Promise.reject(new Error("Token expired"));
+      token = await refreshAccessToken();
+      if (!token) {
+        clearAuthAndRedirect();
+        return Promise.reject(new Error("Token expired"));
+      }
     }
     config.headers.Authorization = `Bearer ${token}`;
   } else {
@@ -46,16 +82,25 @@ api.interceptors.request.use((config) => {
 // Add response interceptor to handle 401 errors globally
 api.interceptors.response.use(
   (response) => response,
-  (error: AxiosError) => {
+  async (error: AxiosError) => {
+    const original = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
     if (error.response?.status === 401) {
-      // Token is invalid or expired, clear auth and redirect
+      // Token was revoked or expired server-side: try one refresh before giving up
+      if (original && !original._retried) {
+        original._retried = true;
+        const token = await refreshAccessToken();
+        if (token) {
+          original.headers.Authorization = `Bearer ${token}`;
+          return api(original);
+        }
+      }
       clearAuthAndRedirect();
     }
     return Promise.reject(error);
   }
 );
 
-export function setAuth(token: string | null) {
+export function setAuth(token: string | null, refreshToken?: string | null) {
   if (token) {
     // Validate token before setting it
     if (isTokenExpired(token)) {
@@ -65,8 +110,12 @@ export function setAuth(token: string | null) {
     }
     api.defaults.headers.common["Authorization"] = `Bearer ${token}`;
     localStorage.setItem("access_token", token);
+    if (refreshToken) {
+      localStorage.setItem("refresh_token", refreshToken);
+    }
   } else {
     delete api.defaults.headers.common["Authorization"];
     localStorage.removeItem("access_token");
+    localStorage.removeItem("refresh_token");
   }
-}
\ No newline at end of file
+}
@@ -10,8 +10,8 @@ export function useAuth() {
   // Always read from localStorage to get the current value
   const getToken = useCallback(() => {
     const token = localStorage.getItem("access_token");
-    // Check if token is expired
-    if (token && isTokenExpired(token)) {
+    // Check if token is expired; with a refresh token the API client renews it on the next request
+    if (token && isTokenExpired(token) && !localStorage.getItem("refresh_token")) {
       localStorage.removeItem("access_token");
       return null;
     }
@@ -50,13 +50,18 @@ export function useAuth() {
     const t = res.data.access_token as string;
     localStorage.setItem("access_token", t);
     setToken(t);
-    setAuth(t);
+    setAuth(t, res.data.refresh_token as string | undefined);
     // Redirect to saved location or default to /hub
     const from = location.state?.from?.pathname || "/hub";
     navigate(from, { replace: true });
   }
 
   function logout() {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (refreshToken) {
+      // Revoke the server-side session; logout proceeds even if this fails
+      axios.post(`${API_BASE}/logout`, { refresh_token: refreshToken }).catch(() => undefined);
+    }
     localStorage.removeItem("access_token");
     setToken(null);
     setAuth(null);
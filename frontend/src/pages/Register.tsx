@@ -38,7 +38,7 @@ export default function Register() {
 
         const token = loginResponse.data.access_token as string;
         localStorage.setItem('access_token', token);
-        setAuth(token);
+        setAuth(token, loginResponse.data.refresh_token);
 
         navigate('/hub', { replace: true });
       } catch (loginErr) {